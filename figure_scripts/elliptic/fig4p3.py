@@ -7,6 +7,7 @@ from itertools import cycle
 
 from phd_scripts.utility_scripts import wing_cla
 from phd_scripts.utility_scripts import panair_wing_cla
+from phd_scripts.utility_scripts import executor
 
 
 # Use lift slope from thin airfoil theory
@@ -28,7 +29,7 @@ a_modified_slender = wing_cla.a_modified_slender(A)
 a_helmbold = wing_cla.a_helmbold(A)
 
 # Calculate the lift slope using Jones' equation
-a_jones = [wing_cla.a_jones(x) for x in A]
+a_jones = wing_cla.a_jones(A)
 
 # Calculate the lift slope using van Dyke's equation
 a_vandyke = wing_cla.a_vandyke(A)
@@ -37,7 +38,7 @@ a_vandyke = wing_cla.a_vandyke(A)
 a_germain = wing_cla.a_germain(A)
 
 # Calculate the lift slope using Hauptman and Miloh's equation
-a_hauptmanmiloh = [wing_cla.a_hauptmanmiloh(x) for x in A]
+a_hauptmanmiloh = wing_cla.a_hauptmanmiloh(A)
 
 # Calculate the lift slope using Kuchemann's equation
 a_kuchemann = wing_cla.a_kuchemann(A)
@@ -63,7 +64,8 @@ medan = wing_cla.a_medan()
 #        np.linspace(4.0, 5.0, 2), np.linspace(6.0, 10.0, 3)))
 A_panair = np.linspace(1.0, 8.0, 8)
 c_panair = 10.0
-cla_panair = [panair_wing_cla.cla(c_panair, x) for x in A_panair]
+cla_panair = executor.starmap(panair_wing_cla.cla,
+        [(c_panair, x) for x in A_panair])
 
 # Define cycles for line patterns and markers
 #lines = cycle([(0, ()), (0, (1,1)), (0, (10,10)), (0, (3,10,1,10)), (0, (10,10,5,10)), (0, (3,10,1,10,1,10)), (0, (5,10)), (0, (15,5,1,5,5,5,1,5)), (0, (1,5))])
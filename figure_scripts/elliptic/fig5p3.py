@@ -4,11 +4,13 @@ sys.path.append('..\\..\\..\\')
 import numpy as np
 import matplotlib.pyplot as plt
 from itertools import cycle
+from functools import partial
 
 from phd_scripts.utility_scripts import wing_cla
 from phd_scripts.utility_scripts import pralines_wing_cla
 from phd_scripts.utility_scripts import panair_wing_cla
 from phd_scripts.utility_scripts import machup_wing_cla
+from phd_scripts.utility_scripts import adaptive_sweep
 
 # Use lift slope from thin airfoil theory
 a0 = 2.0 * np.pi
@@ -18,12 +20,15 @@ c_panair = 10.0
 
 # Calculate the lift slope using Pralines
 A_analytical = np.linspace(0.01, 8, 800)
-A_numerical = np.linspace(0.1, 8, 80)
 A_vortexpanel = np.linspace(1, 8, 8)
 a_panair = [panair_wing_cla.cla(c_panair, x) for x in A_vortexpanel]
 a_classical = wing_cla.a_classical(A_analytical, a0)
 
-a_machup_classical = [machup_wing_cla.cla(x, lowra_method='Classical') for x in A_numerical]
+# Sample the numerical solution where the curve bends (see adaptive_sweep)
+A_numerical, a_machup = adaptive_sweep.sweep({
+        'Classical': partial(machup_wing_cla.cla, lowra_method = 'Classical')},
+        0.1, 8.0, tol = 2.0e-3)
+a_machup_classical = a_machup['Classical']
 
 # Set up a new plot
 plt.rc('font', **{'family':'serif', 'serif':['Times New Roman']})
@@ -4,11 +4,13 @@ sys.path.append('..\\..\\..\\')
 import numpy as np
 import matplotlib.pyplot as plt
 from itertools import cycle
+from functools import partial
 
 from phd_scripts.utility_scripts import wing_cla
 from phd_scripts.utility_scripts import pralines_wing_cla
 from phd_scripts.utility_scripts import panair_wing_cla
 from phd_scripts.utility_scripts import machup_wing_cla
+from phd_scripts.utility_scripts import adaptive_sweep
 
 # Use lift slope from thin airfoil theory
 a0 = 2.0 * np.pi
@@ -18,16 +20,19 @@ c_panair = 10.0
 
 # Calculate the lift slope using Pralines
 A_analytical = np.linspace(0.01, 8, 800)
-A_numerical = np.linspace(0.1, 8, 80)
 A_vortexpanel = np.linspace(1, 8, 8)
 a_panair = [panair_wing_cla.cla(c_panair, x) for x in A_vortexpanel]
 a_classical = wing_cla.a_classical(A_analytical, a0)
 a_modified_slender = wing_cla.a_modified_slender(A_analytical, a0)
 a_hodson = wing_cla.a_hodson(A_analytical, a0)
 
-a_machup_classical = [machup_wing_cla.cla(x, lowra_method='Classical') for x in A_numerical]
-a_machup_modified_slender = [machup_wing_cla.cla(x, lowra_method='ModifiedSlender') for x in A_numerical]
-a_machup_hodson = [machup_wing_cla.cla(x, lowra_method='Hodson') for x in A_numerical]
+# Sample the numerical solutions where the curves bend (see adaptive_sweep)
+A_numerical, a_machup = adaptive_sweep.sweep({
+        method: partial(machup_wing_cla.cla, lowra_method = method)
+        for method in ('Classical', 'ModifiedSlender', 'Hodson')}, 0.1, 8.0, tol = 2.0e-3)
+a_machup_classical = a_machup['Classical']
+a_machup_modified_slender = a_machup['ModifiedSlender']
+a_machup_hodson = a_machup['Hodson']
 
 # Define cycles for line patterns and markers
 lines = cycle([(0, ()), (0, (1,1)), (0, (5,5)), (0, (3,5,1,5))])
@@ -8,6 +8,7 @@ from itertools import cycle
 from phd_scripts.utility_scripts import wing
 from phd_scripts.utility_scripts import pralines
 from phd_scripts.utility_scripts import panair_wing_cla
+from phd_scripts.utility_scripts import executor
 from phd_scripts.utility_scripts import machup_wing_cla
 
 # Use lift slope from thin airfoil theory
@@ -53,7 +54,8 @@ for aspect_ratio in A:
 #        np.linspace(4.0, 5.0, 2), np.linspace(6.0, 10.0, 3)))
 A_panair = np.linspace(1.0, 8.0, 8)
 c = 10.0
-cla_panair = [panair_wing_cla.cla(c, x, rt, False) for x in A_panair]
+cla_panair = executor.starmap(panair_wing_cla.cla,
+        [(c, x, rt, False) for x in A_panair])
 #cla_machup = [machup_wing_cla_tapered.a_machup(x, rt, False) for x in A_panair]
 
 # Define cycles for line patterns and markers
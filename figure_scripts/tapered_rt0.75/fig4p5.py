@@ -8,6 +8,7 @@ from itertools import cycle
 from phd_scripts.utility_scripts import wing
 from phd_scripts.utility_scripts import pralines
 from phd_scripts.utility_scripts import panair_wing_cla
+from phd_scripts.utility_scripts import executor
 
 # Use lift slope from thin airfoil theory
 a0 = 2.0 * np.pi
@@ -40,7 +41,8 @@ for aspect_ratio in A:
 # Get Panair results
 A_panair = np.linspace(1.0, 8.0, 8)
 c = 10.0
-cla_panair = [panair_wing_cla.cla(c, x, rt, False, True, False) for x in A_panair]
+cla_panair = executor.starmap(panair_wing_cla.cla,
+        [(c, x, rt, False, True, False) for x in A_panair])
 
 # Set up a new plot
 plt.rc('font', **{'family':'serif', 'serif':['Times New Roman']})
@@ -0,0 +1,116 @@
+import numpy as np
+
+from phd_scripts.utility_scripts import executor
+
+
+def evaluate(function, x, vectorized = False, max_workers = None, kind = 'thread'):
+    """Evaluate a function of one parameter at several points
+
+    Inputs:
+        function = Function of a single value (e.g. machup_wing_cla.cla or
+                functools.partial(pralines_wing_cla.cla, ...))
+        x = Points
+        vectorized = Does the function accept arrays (e.g. the wing_cla
+                correlations)? Otherwise it is called concurrently for each
+                point (see executor.starmap).
+        max_workers = Maximum number of concurrent calls
+        kind = Type of worker ('process' | 'thread')
+    """
+    x = np.asarray(x, dtype = float)
+    if vectorized: return np.asarray(function(x), dtype = float)
+    return np.asarray(executor.starmap(function, [(float(xi),) for xi in x],
+            max_workers, kind), dtype = float)
+
+
+def interval_errors(x, values):
+    """Estimate the linear-interpolation error on each interval
+
+    The error on an interval of width h is estimated as |f''| h^2 / 8, with
+    f'' the larger second divided difference at the two ends of the
+    interval (curves through fewer than three points have no estimate).
+
+    Inputs:
+        x = Sorted points (n)
+        values = Values of each curve at the points, shape (curves, n)
+
+    Returns the largest estimate over all curves for each interval (n - 1).
+    """
+    values = np.atleast_2d(values)
+    h = np.diff(x)
+    errors = np.zeros(len(h))
+    if len(x) < 3: return errors
+
+    slopes = np.diff(values, axis = -1) / h
+    second = 2.0 * np.abs(np.diff(slopes, axis = -1)) / (h[:-1] + h[1:])
+    left = np.concatenate([second[:, :1], second], axis = -1)
+    right = np.concatenate([second, second[:, -1:]], axis = -1)
+    return np.max(np.maximum(left, right), axis = 0) * h**2 / 8.0
+
+
+def sweep(functions, low, high, tol = 1.0e-3, difference_tol = None, n = 9,
+        max_points = 200, min_width = None, log = True, vectorized = False,
+        max_workers = None, kind = 'thread'):
+    """Sample functions of the aspect ratio (or any single parameter) adaptively
+
+    The functions are first evaluated at n points. Intervals are then
+    bisected, and the functions evaluated at the new points, while the
+    estimated error of interpolating any of the curves linearly across the
+    interval (see interval_errors) exceeds tol, or, if difference_tol is
+    given, while the largest difference between the functions at either end
+    of the interval exceeds difference_tol. The points therefore cluster
+    where the curves bend (the low aspect-ratio knee) and, optionally, where
+    the methods disagree, rather than in the flat high aspect-ratio region.
+    The error is that of straight lines in the parameter (as plotted), while
+    the new points bisect intervals of log(parameter) if log is True.
+
+    Inputs:
+        functions = Dictionary mapping names to functions of one value (see
+                evaluate), e.g. {'Hodson': functools.partial(
+                machup_wing_cla.cla, lowra_method = 'Hodson')}
+        low, high = Range of the parameter
+        tol = Tolerance on the interpolation error of each curve
+        difference_tol = Tolerance on the difference between the functions
+                (None = not used)
+        n = Number of initial points
+        max_points = Maximum number of points
+        min_width = Smallest interval that is bisected, in the refinement
+                coordinate (None = (high - low) / 1024 of that coordinate)
+        log = Refine in log(parameter) instead of the parameter? (True/False)
+        vectorized = Do the functions accept arrays? (see evaluate)
+        max_workers = Maximum number of concurrent calls
+        kind = Type of worker ('process' | 'thread')
+
+    Returns the sorted points and a dictionary of the values of each
+    function at the points.
+    """
+    names = list(functions)
+    to_x = np.exp if log else (lambda u: u)
+    bounds = np.log([low, high]) if log else np.array([low, high], dtype = float)
+    if min_width is None: min_width = (bounds[1] - bounds[0]) / 1024.0
+
+    def run(u):
+        return np.array([evaluate(functions[name], to_x(u), vectorized,
+                max_workers, kind) for name in names]).reshape(len(names), len(u))
+
+    u = np.linspace(bounds[0], bounds[1], n)
+    values = run(u)
+    while len(u) < max_points:
+        errors = interval_errors(to_x(u), values) / tol
+        if difference_tol is not None and len(names) > 1:
+            spread = np.max(values, axis = 0) - np.min(values, axis = 0)
+            errors = np.maximum(errors, np.maximum(spread[:-1], spread[1:]) / difference_tol)
+        errors[np.diff(u) < 2.0 * min_width] = 0.0
+
+        # Bisect the worst intervals first if the point budget runs out
+        refine = np.nonzero(errors > 1.0)[0]
+        if len(refine) == 0: break
+        refine = refine[np.argsort(-errors[refine])][:max_points - len(u)]
+        new = 0.5 * (u[refine] + u[refine + 1])
+
+        u = np.concatenate([u, new])
+        values = np.concatenate([values, run(new)], axis = -1)
+        order = np.argsort(u)
+        u = u[order]
+        values = values[:, order]
+
+    return (to_x(u), dict(zip(names, values)))
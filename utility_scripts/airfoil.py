@@ -2,11 +2,19 @@ import numpy as np
 import os
 import shutil
 import json
+import tempfile
+import threading
+import subprocess
 from collections import OrderedDict
 
 import phd_scripts
 
 
+# Serializes the creation of airfoil database files, since concurrent sweep
+# points (see executor.starmap) create the same airfoils at the same time
+_database_lock = threading.RLock()
+
+
 class FlatPlate(object):
     """Defines the 2D airfoil characteristics of a flat plate
     """
@@ -30,7 +38,8 @@ class Joukowski(object):
     This class is used to define a 2D Joukowski airfoil
     """
     
-    def __init__(self, t, cld, npts, cmd = 'Joukowski.exe', cmddir = None, dbdir = None):
+    def __init__(self, t, cld, npts, cmd = 'Joukowski.exe', cmddir = None, dbdir = None,
+            backend = 'exe'):
         """Constructor
         
         Inputs
@@ -38,6 +47,7 @@ class Joukowski(object):
         t = Maximum thickness
         cld = Design lift coefficient
         npts = Number of points around the airfoil perimeter
+        backend = Airfoil generator ('exe' = Joukowski.exe, 'python' = joukowski_geometry)
         """
         self.t = t
         self.cld = cld
@@ -55,15 +65,29 @@ class Joukowski(object):
         self.dbdir = dbdir
         if self.dbdir is None:
             self.dbdir = phd_scripts.__path__[0] + os.sep + 'AirfoilDatabase'
+
+        self.backend = backend
     
     
     @property
     def name(self):
+        # Airfoils generated by different backends are stored separately
         name = "joukowski_t{}_cl{}_af{}".format(self.t, self.cld, self.npts)
+        if self.backend != 'exe': name += "_{}".format(self.backend)
         return name.replace('.', 'p')
 
 
     def create_airfoil(self):
+        if self.backend == 'python':
+            return create_airfoils([self])
+
+        with _database_lock:
+            return self._create_airfoil()
+
+
+    def _create_airfoil(self):
+        """Create the airfoil with Joukowski.exe (see create_airfoil)
+        """
         airfoil_json_name = self.dbdir + os.sep + self.name + ".json"
         airfoil_profile_name = self.dbdir + os.sep + self.name + "_profile.txt"
         if ((not os.path.isfile(airfoil_json_name)) or
@@ -77,67 +101,319 @@ class Joukowski(object):
                 print("Error: Missing panel code executable {}".format(cmd))
                 return True
         
-            # Write the panel code input commands to a file
-            with open("joukowski_input.txt", "w") as input_file:
-                input_file.write("1\n")  # Select Joukowski airfoil
-                input_file.write("{}\n".format(self.t))  # Airfoil thickness
-                input_file.write("{}\n".format(self.cld))  # Design lift coefficient
-                input_file.write("0.0\n")  # Angle of attack (doesn't change relevant results)
-                input_file.write("0.25\n")  # x/c location for moment calculation (doesn't change relevant results)
-                input_file.write("0.0\n")  # y/c location for moment calculation (doesn't change relevant results)
-                input_file.write("n\n")  # Don't plot pressure distributions
-                input_file.write("n\n")  # Don't plot streamlines
-                input_file.write("y\n")  # Write the airfoil profile
-                input_file.write("{}\n".format(self.npts))  # Number of points on profile
-            
-            # Execute the panel code
-            os.system("{} < joukowski_input.txt > joukowski_stdout".format(cmd))
+            # Run the panel code in a scratch directory, so that concurrent
+            # jobs never share (or depend on) the current working directory
+            scratch = tempfile.mkdtemp(dir = self.dbdir)
+            try:
+                error = self._run_exe(os.path.abspath(cmd), scratch,
+                        airfoil_profile_name)
+            finally:
+                shutil.rmtree(scratch, ignore_errors = True)
+            if error: return True
+
+            # Write the airfoil database entry
+            error = self.write_json()
+            if error: return True
+
+        else:
+            self.read_json()
             
-            # Read the output and extract CL,alpha and alpha_L0
-            with open('joukowski_stdout', 'r') as stdout:
-                stdout_lines = stdout.readlines()
-            self.CL_alpha = float(stdout_lines[15].split()[4])
-            self.alpha_L0 = np.radians(float(stdout_lines[14].split()[3]))
-
-            # Move the output file to the correct filename
-            output_file = "{}.txt".format(self.npts)
-            if not os.path.isfile(output_file):
-                print("Error: Panel code output file is missing! ({})".format(output_file))
-                return True
-                
-            os.rename(output_file, airfoil_profile_name)
-
-            # Make sure the JSON template file exists
-            json_template_name = "flat_plate"
-            json_template_file = self.dbdir + os.sep + json_template_name + ".json"
-            if not os.path.isfile(json_template_file):
-                print("Error: Missing JSON template file {}".format(json_template_file))
-                return True
-                
-            # Read the JSON file template
-            with open(json_template_file, "r") as json_template:
-                json_data_template = json.load(json_template, object_pairs_hook = OrderedDict)
-                
-            # Edit the airfoil name
-            json_data_new = OrderedDict()
-            json_data_new[self.name] = json_data_template[json_template_name]
-            json_data_new[self.name]['properties']['CL_alpha'] = self.CL_alpha
-            json_data_new[self.name]['properties']['alpha_L0'] = self.alpha_L0
+        return False
+
+
+    def _run_exe(self, cmd, scratch, airfoil_profile_name):
+        """Run Joukowski.exe in the scratch directory and store the profile
+
+        Returns True if an error occurred.
+        """
+        # Write the panel code input commands to a file
+        input_name = scratch + os.sep + "joukowski_input.txt"
+        stdout_name = scratch + os.sep + "joukowski_stdout"
+        with open(input_name, "w") as input_file:
+            input_file.write("1\n")  # Select Joukowski airfoil
+            input_file.write("{}\n".format(self.t))  # Airfoil thickness
+            input_file.write("{}\n".format(self.cld))  # Design lift coefficient
+            input_file.write("0.0\n")  # Angle of attack (doesn't change relevant results)
+            input_file.write("0.25\n")  # x/c location for moment calculation (doesn't change relevant results)
+            input_file.write("0.0\n")  # y/c location for moment calculation (doesn't change relevant results)
+            input_file.write("n\n")  # Don't plot pressure distributions
+            input_file.write("n\n")  # Don't plot streamlines
+            input_file.write("y\n")  # Write the airfoil profile
+            input_file.write("{}\n".format(self.npts))  # Number of points on profile
+
+        # Execute the panel code
+        with open(input_name, 'r') as stdin, open(stdout_name, 'w') as stdout:
+            subprocess.call([cmd], stdin = stdin, stdout = stdout, cwd = scratch)
+
+        # Read the output and extract CL,alpha and alpha_L0
+        with open(stdout_name, 'r') as stdout:
+            stdout_lines = stdout.readlines()
+        self.CL_alpha = float(stdout_lines[15].split()[4])
+        self.alpha_L0 = np.radians(float(stdout_lines[14].split()[3]))
+
+        # Move the output file to the correct filename
+        output_file = scratch + os.sep + "{}.txt".format(self.npts)
+        if not os.path.isfile(output_file):
+            print("Error: Panel code output file is missing! ({})".format(output_file))
+            return True
+
+        os.replace(output_file, airfoil_profile_name)
+        return False
+
+
+    @property
+    def exists(self):
+        """Check whether the airfoil database files exist
+        """
+        return (os.path.isfile(self.dbdir + os.sep + self.name + ".json") and
+                os.path.isfile(self.dbdir + os.sep + self.name + "_profile.txt"))
+
+
+    def read_json(self):
+        """Read CL_alpha and alpha_L0 from the airfoil database JSON file
+        """
+        airfoil_json_name = self.dbdir + os.sep + self.name + ".json"
+        with open(airfoil_json_name) as affile:
+            afdata = json.load(affile, object_pairs_hook = OrderedDict)
             
-            # Write the new JSON file
-            with open(airfoil_json_name, 'w') as json_new:
-                json.dump(json_data_new, json_new, indent = 4)
-                
-            # Clean up temporary files
-            os.remove('joukowski_input.txt')
-            os.remove('joukowski_stdout')
+        self.CL_alpha = afdata[self.name]["properties"]["CL_alpha"]
+        self.alpha_L0 = afdata[self.name]["properties"]["alpha_L0"]
 
-        else:
-            # Airfoil files already exist, parse existing JSON file
-            with open(airfoil_json_name) as affile:
-                afdata = json.load(affile, object_pairs_hook = OrderedDict)
-                
-            self.CL_alpha = afdata[self.name]["properties"]["CL_alpha"]
-            self.alpha_L0 = afdata[self.name]["properties"]["alpha_L0"]
+
+    def write_json(self):
+        """Write the airfoil database JSON file using the flat plate as a template
+        """
+        # Make sure the JSON template file exists
+        json_template_name = "flat_plate"
+        json_template_file = self.dbdir + os.sep + json_template_name + ".json"
+        if not os.path.isfile(json_template_file):
+            print("Error: Missing JSON template file {}".format(json_template_file))
+            return True
+            
+        # Read the JSON file template
+        with open(json_template_file, "r") as json_template:
+            json_data_template = json.load(json_template, object_pairs_hook = OrderedDict)
             
+        # Edit the airfoil name
+        json_data_new = OrderedDict()
+        json_data_new[self.name] = json_data_template[json_template_name]
+        json_data_new[self.name]['properties']['CL_alpha'] = float(self.CL_alpha)
+        json_data_new[self.name]['properties']['alpha_L0'] = float(self.alpha_L0)
+        
+        # Write the new JSON file (replacing any existing file in one step)
+        fd, tmp = tempfile.mkstemp(dir = self.dbdir)
+        with os.fdopen(fd, 'w') as json_new:
+            json.dump(json_data_new, json_new, indent = 4)
+        os.replace(tmp, self.dbdir + os.sep + self.name + ".json")
+
         return False
+
+
+def create_airfoils(airfoils):
+    """Create the airfoil database files for a list of Joukowski airfoils
+
+    The geometry and section properties of every airfoil that is missing from
+    its database are computed together using joukowski_geometry, and the
+    profile and JSON files are written in the same format as Joukowski.exe.
+    The properties of airfoils that already exist are read from the database.
+
+    Inputs:
+        airfoils = List of Joukowski objects
+
+    Returns True if an error occurred.
+    """
+    with _database_lock:
+        return _create_airfoils(airfoils)
+
+
+def _create_airfoils(airfoils):
+    """Create the airfoils while holding the database lock (see create_airfoils)
+    """
+    missing = [a for a in airfoils if not a.exists]
+    for a in airfoils:
+        if a.exists: a.read_json()
+
+    if len(missing) == 0: return False
+
+    t = np.asarray([a.t for a in missing], dtype = float)
+    cld = np.asarray([a.cld for a in missing], dtype = float)
+    geometry = joukowski_geometry(t, cld)
+
+    # Generate the profiles, grouping airfoils with the same number of points
+    npts = np.asarray([a.npts for a in missing])
+    for n in np.unique(npts):
+        group = np.nonzero(npts == n)[0]
+        x, y = joukowski_profile(geometry[group], n)
+        for i, j in enumerate(group):
+            a = missing[j]
+            a.CL_alpha = geometry['CL_alpha'][j]
+            a.alpha_L0 = geometry['alpha_L0'][j]
+
+            fd, tmp = tempfile.mkstemp(dir = a.dbdir)
+            with os.fdopen(fd, 'w') as profile:
+                profile.write("{:12d}\n".format(len(x[i])))  # Number of points
+                for xp, yp in zip(x[i], y[i]):
+                    profile.write("{:26.16E}{:25.16E}\n".format(xp, yp))
+            os.replace(tmp, a.dbdir + os.sep + a.name + "_profile.txt")
+
+            error = a.write_json()
+            if error: return True
+
+    return False
+
+
+def _joukowski_surface(x0, y0, phi):
+    """Map points on the Joukowski circle to the airfoil surface
+
+    The circle is centered at (x0, y0) and passes through the singular point
+    zeta = 1 of the transformation z = zeta + 1 / zeta. The angle phi is
+    measured from the trailing edge (phi = 0) around the circle toward the
+    upper surface.
+    """
+    R = np.sqrt((1.0 - x0)**2 + y0**2)
+    beta = np.arcsin(y0 / R)
+    zeta = (x0 + 1j * y0)[..., None] + R[..., None] * np.exp(1j * (phi - beta[..., None]))
+    return (zeta + 1.0 / zeta, R, beta)
+
+
+def _joukowski_frame(x0, y0, npts = 2001):
+    """Locate the leading edge and chord line of Joukowski airfoils
+
+    The leading edge is the point on the surface farthest from the trailing
+    edge (z = 2), located by parabolic refinement of a dense sampling.
+    """
+    phi = np.linspace(0.0, 2.0 * np.pi, npts)
+    z, R, beta = _joukowski_surface(x0, y0, phi)
+    d = np.abs(z - 2.0)
+    i = np.clip(np.argmax(d, axis = -1), 1, npts - 2)
+    rows = np.arange(len(i))
+    d0, d1, d2 = d[rows, i - 1], d[rows, i], d[rows, i + 1]
+    dphi = phi[1] - phi[0]
+    phi_le = phi[i] + 0.5 * dphi * (d0 - d2) / (d0 - 2.0 * d1 + d2)
+
+    z_le = _joukowski_surface(x0, y0, phi_le[:, None])[0][:, 0]
+    chord = np.abs(2.0 - z_le)
+    gamma = np.angle(2.0 - z_le)
+    return (phi_le, z_le, chord, gamma, R, beta)
+
+
+def _joukowski_thickness(x0, y0, npts = 2001):
+    """Calculate the maximum thickness (fraction of chord) of Joukowski airfoils
+
+    The thickness is measured perpendicular to the chord line, by
+    interpolating the lower surface to the chordwise locations of the upper
+    surface.
+    """
+    phi_le, z_le, chord, gamma, R, beta = _joukowski_frame(x0, y0, npts)
+
+    # Sample each surface from the leading edge to the trailing edge, in
+    # coordinates normalized by the chord
+    s = np.linspace(0.0, 1.0, npts)
+    phi_u = phi_le[:, None] * (1.0 - s)
+    phi_l = phi_le[:, None] + (2.0 * np.pi - phi_le[:, None]) * s
+    rotate = np.exp(-1j * gamma)[:, None] / chord[:, None]
+    zu = (_joukowski_surface(x0[:, None], y0[:, None], phi_u[:, :, None])[0][..., 0]
+            - z_le[:, None]) * rotate
+    zl = (_joukowski_surface(x0[:, None], y0[:, None], phi_l[:, :, None])[0][..., 0]
+            - z_le[:, None]) * rotate
+
+    # Interpolate all lower surfaces at once by offsetting each row so that
+    # the flattened chordwise coordinates remain sorted
+    offset = 2.0 * np.arange(len(x0))[:, None]
+    xl = (zl.real + offset).ravel()
+    xu = (zu.real + offset).ravel()
+    yl_at_xu = np.interp(xu, xl, zl.imag.ravel()).reshape(zu.shape)
+
+    return np.max(zu.imag - yl_at_xu, axis = -1)
+
+
+def joukowski_geometry(t, cld, tol = 1.0e-10, maxiter = 50):
+    r"""Calculate the Joukowski circle and section properties for given airfoils
+
+    This function finds the circle (center x0 + i y0, passing through the
+    singular point zeta = 1 of the Joukowski transformation) that produces an
+    airfoil with maximum thickness t and design lift coefficient cld, for
+    arrays of airfoils at once. The design lift coefficient is the lift
+    coefficient at zero angle of attack relative to the chord line.
+
+    From potential flow about the circle, the section lift coefficient is
+
+            c_l = \frac{8 \pi R}{c} \sin(\alpha - \alpha_{L0})
+
+    so that the lift slope at zero lift is CL_alpha = 8 pi R / c.
+
+    Inputs:
+        t = Maximum thickness (fraction of chord)
+        cld = Design lift coefficient
+        tol = Convergence tolerance on thickness and design lift coefficient
+        maxiter = Maximum number of iterations
+
+    Returns a structured array with the fields x0, y0, R, chord, phi_le,
+    z_le (real and imaginary parts in z_le_x and z_le_y), gamma (chord line
+    angle), CL_alpha and alpha_L0.
+    """
+    t, cld = np.broadcast_arrays(np.atleast_1d(np.asarray(t, dtype = float)),
+            np.atleast_1d(np.asarray(cld, dtype = float)))
+    t = t.ravel()
+    cld = cld.ravel()
+
+    # Initial guess from the thin-airfoil approximation t ~ 3 sqrt(3) / 4 eps
+    eps = t / (0.75 * np.sqrt(3.0))
+    y0 = np.zeros(t.shape)
+    for i in range(maxiter):
+        x0 = -eps
+        t_eps = _joukowski_thickness(x0, y0)
+        phi_le, z_le, chord, gamma, R, beta = _joukowski_frame(x0, y0)
+        cl = 8.0 * np.pi * R / chord * np.sin(beta + gamma)
+
+        error = np.maximum(np.abs(t_eps - t), np.abs(cl - cld))
+        if np.all(error < tol): break
+
+        # Update the thickness parameter and the circle center height
+        eps = eps * np.where(t_eps > 0.0, t / np.where(t_eps > 0.0, t_eps, 1.0), 1.0)
+        target = np.arcsin(np.clip(cld * chord / (8.0 * np.pi * R), -1.0, 1.0))
+        y0 = y0 + R * (target - (beta + gamma))
+
+    geometry = np.zeros(t.shape, dtype = [('x0', float), ('y0', float), ('R', float),
+            ('chord', float), ('phi_le', float), ('z_le_x', float), ('z_le_y', float),
+            ('gamma', float), ('beta', float), ('CL_alpha', float), ('alpha_L0', float)])
+    geometry['x0'] = x0
+    geometry['y0'] = y0
+    geometry['R'] = R
+    geometry['chord'] = chord
+    geometry['phi_le'] = phi_le
+    geometry['z_le_x'] = z_le.real
+    geometry['z_le_y'] = z_le.imag
+    geometry['gamma'] = gamma
+    geometry['beta'] = beta
+    geometry['CL_alpha'] = 8.0 * np.pi * R / chord
+    geometry['alpha_L0'] = -(beta + gamma)
+
+    return geometry
+
+
+def joukowski_profile(geometry, npts):
+    """Calculate the profile coordinates of Joukowski airfoils
+
+    The npts points are evenly spaced in angle around the Joukowski circle,
+    starting and ending at the trailing edge and proceeding over the upper
+    surface first, as in the profiles written by Joukowski.exe (for an even
+    npts, no point falls exactly on the leading edge). The coordinates are
+    normalized so that the leading edge is at (0, 0) and the trailing edge
+    is at (1, 0).
+
+    Inputs:
+        geometry = Structured array returned by joukowski_geometry
+        npts = Number of points around the airfoil perimeter
+    """
+    phi = np.linspace(0.0, 2.0 * np.pi, npts)
+    z = _joukowski_surface(geometry['x0'], geometry['y0'], phi)[0]
+    z_le = (geometry['z_le_x'] + 1j * geometry['z_le_y'])[:, None]
+    rotate = np.exp(-1j * geometry['gamma'])[:, None] / geometry['chord'][:, None]
+    z = (z - z_le) * rotate
+
+    # Remove round-off at the trailing edge
+    z[:, 0] = 1.0
+    z[:, -1] = 1.0
+
+    return (z.real, z.imag)
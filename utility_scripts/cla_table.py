@@ -0,0 +1,247 @@
+import numpy as np
+import os
+import tempfile
+
+from phd_scripts.utility_scripts import lifting_line
+from phd_scripts.utility_scripts import executor
+
+
+# Axes of the tables, in the order of the table dimensions after the method
+AXES = ('RA', 'RT', 'a0')
+
+
+def solve_batch(RA, RT, a0, larc, nSec = 100):
+    """Calculate wing lift slopes with lifting_line.solve_batch (the 'python' backend)
+
+    Inputs:
+        RA, RT, a0, larc = Broadcast arrays of the wing parameters (RT = NaN
+                for an elliptic planform)
+        nSec = Number of spanwise sections per semispan
+    """
+    return lifting_line.solve_batch(RA, RT, a0, larc, nSec)['CL_alpha']
+
+
+def _evaluate(backend, RA, RT, a0, larc):
+    """Evaluate a backend on broadcast arrays of wing parameters
+
+    The 'python' backend solves all the wings together. Any other backend is
+    a function cla(RA, RT, a0, larc) of scalars (RT = None for an elliptic
+    planform), which is called concurrently for every wing (see
+    executor.starmap).
+    """
+    RA, RT, a0, larc = np.broadcast_arrays(np.asarray(RA, dtype = float),
+            np.asarray(RT, dtype = float), np.asarray(a0, dtype = float),
+            np.asarray(larc))
+    if backend == 'python': return solve_batch(RA, RT, a0, larc)
+
+    args = [(float(ra), None if np.isnan(rt) else float(rt), float(a), str(m))
+            for ra, rt, a, m in zip(RA.ravel(), RT.ravel(), a0.ravel(), larc.ravel())]
+    return np.reshape(executor.starmap(backend, args), RA.shape)
+
+
+def build(filename, RA, RT = None, a0 = 2.0 * np.pi, larc = 'Classical',
+        backend = 'python', holdout = 100, seed = 0):
+    """Fill a table of wing lift slopes on a tensor-product grid and save it
+
+    The lift slope is computed once for every combination of the grid values
+    and saved as an .npz file (see CLaTable). The interpolation error of the
+    table is then measured at randomly chosen wings inside the grid, which
+    are solved with the same backend, and saved with the table.
+
+    Inputs:
+        filename = Name of the .npz file
+        RA = Grid of aspect ratios (increasing)
+        RT = Grid of taper ratios (increasing), or None for an elliptic planform
+        a0 = Grid of section lift slopes (increasing), or a single value
+        larc = Low-aspect-ratio correction method(s) (see
+                lifting_line.LOWRA_METHODS)
+        backend = 'python' (lifting_line.solve_batch) or a function
+                cla(RA, RT, a0, larc) returning the lift slope of one wing
+        holdout = Number of held-out wings used to measure the error
+        seed = Seed for choosing the held-out wings
+
+    Returns the CLaTable.
+    """
+    axes = [np.atleast_1d(np.asarray(RA, dtype = float)),
+            np.atleast_1d(np.asarray(np.nan if RT is None else RT, dtype = float)),
+            np.atleast_1d(np.asarray(a0, dtype = float))]
+    methods = np.atleast_1d(np.asarray(larc))
+
+    grid = np.meshgrid(methods, *axes, indexing = 'ij')
+    values = _evaluate(backend, grid[1], grid[2], grid[3], grid[0])
+
+    table = CLaTable(methods, axes, values)
+
+    # Measure the interpolation error at held-out wings
+    if holdout > 0:
+        rng = np.random.default_rng(seed)
+        points = [rng.uniform(axis[0], axis[-1], holdout) if len(axis) > 1 else
+                np.full(holdout, axis[0]) for axis in axes]
+        for i, method in enumerate(methods):
+            exact = _evaluate(backend, points[0], points[1], points[2], method)
+            for interpolation in CLaTable.INTERPOLATIONS:
+                approx = table(points[0], points[1], points[2], method, interpolation)
+                table.errors[interpolation][i] = np.max(np.abs(approx / exact - 1.0))
+
+    table.save(filename)
+    return table
+
+
+class CLaTable(object):
+    """Precomputed wing lift slopes interpolated on a tensor-product grid
+
+    The lift slope is tabulated for each low-aspect-ratio method on a grid of
+    aspect ratio, taper ratio and section lift slope (see build) and
+    interpolated with tensor-product piecewise polynomials, using the
+    logarithm of the aspect ratio as the coordinate. The coefficients are
+    computed once for each method (see _grid_interpolator), so a query only
+    evaluates polynomials. Axes with a single value (e.g. the taper ratio of
+    an elliptic table) are not interpolated.
+
+    The cubic and monotone cubic methods need at least four grid values, so
+    axes with only two or three values (e.g. a few section lift slopes) are
+    interpolated linearly, and the other axes with the chosen method.
+
+    The maximum relative error of each interpolation method at the held-out
+    wings checked by build is stored in errors.
+    """
+    # Interpolation methods ('cubic' = not-a-knot cubic spline, 'pchip' =
+    # monotone cubic)
+    INTERPOLATIONS = ('cubic', 'pchip')
+
+    def __init__(self, methods, axes, values, errors = None):
+        """Constructor
+
+        Inputs
+        ------
+        methods:    Low-aspect-ratio correction methods
+        axes:       Grid values of RA, RT (NaN = elliptic) and a0
+        values:     Lift slopes, shape (methods, RA, RT, a0)
+        errors:     Maximum relative interpolation error of each method
+                    (dictionary of arrays keyed by interpolation method)
+        """
+        self.methods = [str(m) for m in methods]
+        self.axes = [np.asarray(axis, dtype = float) for axis in axes]
+        self.values = np.asarray(values, dtype = float)
+        self.errors = errors if errors is not None else {
+                interpolation: np.full(len(self.methods), np.nan)
+                for interpolation in self.INTERPOLATIONS}
+        self._interpolators = {}
+
+
+    @classmethod
+    def load(cls, filename):
+        """Load a table saved by build or save
+        """
+        with np.load(filename) as data:
+            errors = {interpolation: data['error_' + interpolation]
+                    for interpolation in cls.INTERPOLATIONS}
+            return cls(data['methods'], [data[axis] for axis in AXES],
+                    data['values'], errors)
+
+
+    def save(self, filename):
+        """Save the table as an .npz file (replacing any existing file in one step)
+        """
+        errors = {'error_' + k: v for k, v in self.errors.items()}
+        fd, tmp = tempfile.mkstemp(dir = os.path.dirname(os.path.abspath(filename)))
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, methods = np.asarray(self.methods), values = self.values,
+                    **dict(zip(AXES, self.axes)), **errors)
+        os.replace(tmp, filename)
+
+
+    def interpolator(self, larc, interpolation = 'cubic'):
+        """Get the interpolator of one low-aspect-ratio method
+
+        The interpolators are created on first use and reused.
+        """
+        key = (larc, interpolation)
+        if key not in self._interpolators:
+            if larc not in self.methods:
+                raise ValueError("Method '{}' is not in the table".format(larc))
+            active = [len(axis) > 1 for axis in self.axes]
+            points = [np.log(axis) if name == 'RA' else axis
+                    for name, axis, a in zip(AXES, self.axes, active) if a]
+            values = self.values[self.methods.index(larc)]
+            values = values.reshape([len(axis) for axis, a in zip(self.axes, active) if a])
+            self._interpolators[key] = (active, _grid_interpolator(points, values,
+                    interpolation))
+
+        return self._interpolators[key]
+
+
+    def __call__(self, RA, RT = None, a0 = 2.0 * np.pi, larc = 'Classical',
+            interpolation = 'cubic'):
+        """Interpolate the wing lift slope
+
+        Inputs:
+            RA = Aspect ratio(s)
+            RT = Taper ratio(s) (ignored if the table has a single taper ratio)
+            a0 = Section lift slope(s) (ignored if the table has a single a0)
+            larc = Low-aspect-ratio correction method
+            interpolation = One of INTERPOLATIONS
+
+        Returns the lift slope(s), with the broadcast shape of the inputs.
+        Points outside the grid raise ValueError.
+        """
+        active, interpolator = self.interpolator(larc, interpolation)
+        RA, RT, a0 = np.broadcast_arrays(np.asarray(RA, dtype = float),
+                np.asarray(np.nan if RT is None else RT, dtype = float),
+                np.asarray(a0, dtype = float))
+        coordinates = [np.log(RA), RT, a0]
+        points = np.stack([x.ravel() for x, a in zip(coordinates, active) if a], axis = -1)
+        return interpolator(points).reshape(RA.shape)[()]
+
+
+def _grid_interpolator(points, values, method):
+    """Create an interpolator on a tensor-product grid
+
+    The piecewise polynomial coefficients are found by fitting 1-D
+    interpolants (scipy.interpolate.CubicSpline or PchipInterpolator) along
+    each axis in turn, starting with the last, to the coefficients found
+    along the previous axes. Axes with fewer than four values, and every
+    axis when method is 'linear', are interpolated linearly. The result is
+    evaluated with scipy.interpolate.NdPPoly.
+
+    Inputs:
+        points = Grid values of each axis
+        values = Values on the grid
+        method = 'cubic', 'pchip' or 'linear'
+
+    Returns a function of an array of points, shape (n, axes), which raises
+    ValueError for points outside the grid.
+    """
+    from scipy.interpolate import CubicSpline, PchipInterpolator, NdPPoly
+
+    d = len(points)
+    c = np.asarray(values, dtype = float)
+    for i in reversed(range(d)):
+        # Each fit puts its (order, interval) axes first, ahead of the
+        # axes already fitted
+        x = points[i]
+        axis = 2 * (d - 1 - i) + i
+        if method == 'linear' or len(x) < 4:
+            y = np.moveaxis(c, axis, 0)
+            h = np.diff(x).reshape((-1,) + (1,) * (y.ndim - 1))
+            c = np.stack([np.diff(y, axis = 0) / h, y[:-1]])
+        elif method == 'cubic':
+            c = CubicSpline(x, c, axis = axis).c
+        elif method == 'pchip':
+            c = PchipInterpolator(x, c, axis = axis).c
+        else:
+            raise ValueError("Unknown interpolation method '{}'".format(method))
+
+    # NdPPoly expects the order axes first, then the interval axes
+    c = c.transpose(list(range(0, 2 * d, 2)) + list(range(1, 2 * d, 2)))
+    polynomial = NdPPoly(c, tuple(points), extrapolate = False)
+    low = np.array([x[0] for x in points])
+    high = np.array([x[-1] for x in points])
+
+    def interpolate(x):
+        x = np.asarray(x, dtype = float)
+        if np.any((x < low) | (x > high)):
+            raise ValueError("One of the requested points is outside the table")
+        return polynomial(x)
+
+    return interpolate
@@ -0,0 +1,165 @@
+import os
+import threading
+import concurrent.futures
+
+
+# Jobs executing at once in this process. Sweeps run with starmap call run
+# from several threads, each with its own pool, so the pools share this
+# bound (see set_job_limit).
+_job_slots = threading.BoundedSemaphore(os.cpu_count() or 1)
+
+
+def set_job_limit(n = None):
+    """Set the maximum number of jobs executing at once in this process
+
+    The limit applies to every pool created by as_completed and run,
+    including the pools started by concurrent calls of starmap. It should
+    be set before any jobs are started.
+
+    Inputs:
+        n = Maximum number of concurrent jobs (None = number of CPUs)
+    """
+    global _job_slots
+    _job_slots = threading.BoundedSemaphore(n or os.cpu_count() or 1)
+
+
+def execute(job):
+    """Execute a prepared wrapper object
+
+    Returns the job (with any in-process results) and the return code of its
+    execute method. Wrappers that solve the problem in Python return None,
+    which is reported as a return code of 0. The job waits for one of the
+    slots shared by all pools (see set_job_limit).
+
+    Inputs:
+        job = Wrapper object whose setup method has already been called
+    """
+    with _job_slots:
+        returncode = job.execute()
+    return (job, 0 if returncode is None else returncode)
+
+
+def pool(max_workers = None, kind = 'thread'):
+    """Create a pool of workers for running jobs
+
+    Inputs:
+        max_workers = Maximum number of concurrent jobs (None = number of CPUs)
+        kind = Type of worker ('process' | 'thread')
+    """
+    if max_workers is None: max_workers = os.cpu_count() or 1
+    if kind == 'thread':
+        return concurrent.futures.ThreadPoolExecutor(max_workers)
+    return concurrent.futures.ProcessPoolExecutor(max_workers)
+
+
+def as_completed(jobs, max_workers = None, kind = 'thread'):
+    """Execute prepared wrapper objects concurrently, yielding each as it finishes
+
+    The execute method of each job is run on a pool of at most max_workers
+    workers. Jobs executed in worker processes are copied back, so results
+    held in memory (e.g. by the in-process solvers) are copied into the
+    original objects before they are yielded.
+
+    The wrappers never change the working directory of this process, so the
+    executables can be launched from threads (the default). Process workers
+    are only useful for the in-process solvers; on platforms that spawn
+    worker processes (Windows), the calling script must then not start new
+    jobs when it is imported.
+
+    Inputs:
+        jobs = List of wrapper objects whose setup methods have been called
+        max_workers = Maximum number of concurrent jobs (None = number of CPUs)
+        kind = Type of worker ('process' | 'thread')
+
+    Yields (index, return code) for each job in the order the jobs finish.
+    """
+    jobs = list(jobs)
+    if len(jobs) == 0: return
+
+    with pool(min(max_workers or os.cpu_count() or 1, len(jobs)), kind) as workers:
+        futures = {workers.submit(execute, job): i for i, job in enumerate(jobs)}
+        for future in concurrent.futures.as_completed(futures):
+            i = futures[future]
+            job, returncode = future.result()
+            if job is not jobs[i]: jobs[i].__dict__.update(job.__dict__)
+            yield (i, returncode)
+
+
+def complete(job):
+    """Check that a job has written all of its result files
+
+    Jobs without result files (the in-process solvers) are always complete.
+
+    Inputs:
+        job = Wrapper object whose execute method has been called
+    """
+    files = getattr(job, 'result_files', [])
+    return all(os.path.isfile(job.jobdir + os.sep + name) for name in files)
+
+
+def run(jobs, max_workers = None, kind = 'thread', cache = None, db = None):
+    """Execute prepared wrapper objects concurrently and wait for all of them
+
+    Jobs that return 0 without writing all their result files are reported
+    and neither cached nor recorded; a job that cannot be recorded is
+    reported and the other jobs continue.
+
+    Inputs:
+        jobs = List of wrapper objects whose setup methods have been called
+        max_workers = Maximum number of concurrent jobs (None = number of CPUs)
+        kind = Type of worker ('process' | 'thread')
+        cache = result_cache.ResultCache storing the results of each job
+                that succeeds (None = do not store results)
+        db = results_db.ResultsDB recording each job that succeeds (None =
+                do not record results)
+
+    Returns a list of return codes in the same order as jobs.
+    """
+    jobs = list(jobs)
+    returncodes = [None] * len(jobs)
+    for i, returncode in as_completed(jobs, max_workers, kind):
+        if returncode != 0:
+            print("Warning: job '{}' returned {}".format(jobs[i].name, returncode))
+        elif not complete(jobs[i]):
+            print("Warning: results of '{}' are incomplete and were not stored".format(
+                    jobs[i].name))
+        else:
+            if cache is not None: cache.store(jobs[i])
+            if db is not None:
+                try:
+                    db.record(jobs[i])
+                except Exception as error:
+                    print("Warning: results of '{}' were not recorded ({})".format(
+                            jobs[i].name, error))
+        returncodes[i] = returncode
+
+    return returncodes
+
+
+def starmap(function, args, max_workers = None, kind = 'thread'):
+    """Call a function concurrently for each set of arguments
+
+    This is used to run whole analyses (e.g. each point of a sweep) at the
+    same time. The function must be defined at the module level when kind is
+    'process'. Jobs started by the calls (see run) share the process-wide
+    limit on concurrent jobs, so the total number of solver processes does
+    not grow with the number of calls.
+
+    Inputs:
+        function = Function to call
+        args = List of argument tuples
+        max_workers = Maximum number of concurrent calls (None = number of CPUs)
+        kind = Type of worker ('process' | 'thread')
+
+    Returns a list of the results in the same order as args.
+    """
+    args = [tuple(a) for a in args]
+    if len(args) == 0: return []
+
+    results = [None] * len(args)
+    with pool(min(max_workers or os.cpu_count() or 1, len(args)), kind) as workers:
+        futures = {workers.submit(function, *a): i for i, a in enumerate(args)}
+        for future in concurrent.futures.as_completed(futures):
+            results[futures[future]] = future.result()
+
+    return results
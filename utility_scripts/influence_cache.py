@@ -0,0 +1,169 @@
+import numpy as np
+import os
+import glob
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class InfluenceCache(object):
+    """Least-recently-used cache of geometry-only lifting-line matrices
+
+    Lifting-line influence matrices depend only on the wing planform and
+    grid, not on the section lift slope or the low-aspect-ratio correction.
+    This class stores them (and their factorizations) in memory, keyed on the
+    wing geometry, and evicts the least recently used entries once maxsize
+    entries are held. If cachedir is set, entries are also saved to (and
+    loaded from) .npy files in that directory. The cache may be shared by
+    analyses running in several threads.
+    """
+    def __init__(self, maxsize = 32, cachedir = None):
+        """Constructor
+
+        Inputs
+        ------
+        maxsize:    Maximum number of entries held in memory
+        cachedir:   Directory for the on-disk tier (None = memory only)
+        """
+        self.maxsize = maxsize
+        self.cachedir = cachedir
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+
+    def get(self, key, builder):
+        """Get the entry for this key, building it if necessary
+
+        Inputs:
+            key = Hashable key (see wing_key)
+            builder = Function with no arguments that returns a dictionary of
+                    NumPy arrays for this key
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            entry = self.load(key)
+            if entry is None:
+                self.misses += 1
+                entry = builder()
+                self.save(key, entry)
+            else:
+                self.hits += 1
+
+            self._entries[key] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last = False)
+
+            return entry
+
+
+    def clear(self):
+        """Remove all entries from the in-memory tier
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+    def path(self, key):
+        """Get the on-disk directory for this key
+        """
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return self.cachedir + os.sep + digest
+
+
+    def load(self, key):
+        """Load an entry from the on-disk tier (None if not available)
+        """
+        if self.cachedir is None: return None
+        path = self.path(key)
+        if not os.path.isdir(path): return None
+
+        entry = {}
+        for filename in glob.glob(path + os.sep + '*.npy'):
+            name = os.path.splitext(os.path.basename(filename))[0]
+            entry[name] = np.load(filename)
+
+        return entry
+
+
+    def save(self, key, entry):
+        """Save an entry to the on-disk tier (if enabled)
+        """
+        if self.cachedir is None: return
+        path = self.path(key)
+        if os.path.isdir(path): return
+
+        if not os.path.isdir(self.cachedir): os.makedirs(self.cachedir)
+        tmp = tempfile.mkdtemp(dir = self.cachedir)
+        for name, value in entry.items():
+            np.save(tmp + os.sep + name + '.npy', value)
+
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Another process saved the same entry first
+            shutil.rmtree(tmp)
+
+
+# Cache shared by the lifting-line solvers
+default_cache = InfluenceCache()
+
+
+def wing_key(wing, *args):
+    """Create a cache key from the planform and grid of a wing
+
+    Inputs:
+        wing = Wing object
+        args = Additional values that distinguish the entry (e.g. the model)
+    """
+    return (type(wing).__name__, float(wing.RA), getattr(wing, 'RT', None),
+            float(wing.b), int(wing.nSec), bool(wing.root_clustering),
+            bool(wing.tip_clustering), bool(wing.symm)) + tuple(args)
+
+
+def eigen_factorization(K, left = None, right = None):
+    """Factor a matrix for repeated solves of shifted systems
+
+    The matrix K is decomposed as K = V diag(values) V^-1, so that systems of
+    the form (shift I + scale K) x = r can be solved for any shift and scale
+    with two matrix-vector products (see spectral_solve). Optional left and
+    right matrices are folded into the stored factors, giving the solution
+    x = left (shift I + scale K)^-1 right r.
+
+    Inputs:
+        K = Square matrix
+        left = Matrix applied to the solution (None = identity)
+        right = Matrix applied to the right-hand side (None = identity)
+    """
+    values, vectors = np.linalg.eig(K)
+    inverse = np.linalg.inv(vectors)
+    if np.all(values.imag == 0.0):
+        values = values.real
+        vectors = vectors.real
+        inverse = inverse.real
+
+    if left is not None: vectors = np.dot(left, vectors)
+    if right is not None: inverse = np.dot(inverse, right)
+
+    return {'values': values, 'left': vectors, 'right': inverse}
+
+
+def spectral_solve(entry, rhs, shift, scale):
+    """Solve a shifted system using a stored eigen_factorization
+
+    Inputs:
+        entry = Dictionary returned by eigen_factorization
+        rhs = Right-hand side vector
+        shift = Multiple of the identity matrix
+        scale = Multiple of the factored matrix
+    """
+    x = np.dot(entry['left'], np.dot(entry['right'], rhs) /
+            (shift + scale * entry['values']))
+    return np.real(x)
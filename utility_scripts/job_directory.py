@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+
+
+# Policies for handling a job directory that already exists
+POLICIES = ('reuse', 'overwrite', 'fail')
+
+# File holding the cache key of the job that created a directory
+KEY_FILE = 'cache_key'
+
+
+def policy(overwrite):
+    """Convert the overwrite argument used by the wrappers to a policy name
+
+    Inputs:
+        overwrite = One of POLICIES, or True ('overwrite'), False ('reuse') or
+                None ('fail')
+    """
+    if overwrite is None: return 'fail'
+    if isinstance(overwrite, str):
+        if overwrite not in POLICIES:
+            raise ValueError("Unknown job directory policy '{}'".format(overwrite))
+        return overwrite
+
+    return 'overwrite' if overwrite else 'reuse'
+
+
+def read_key(path):
+    """Read the cache key stored in a job directory (None if there is none)
+    """
+    filename = path + os.sep + KEY_FILE
+    if not os.path.isfile(filename): return None
+    with open(filename, 'r') as key_file:
+        return key_file.read().strip()
+
+
+def create(path, overwrite = None, populate = None, key = None):
+    """Create a job directory atomically
+
+    The job files are written by populate into a temporary directory next to
+    path, which is then renamed to path. Other jobs therefore never see a
+    partially written job directory, and an interrupted setup never leaves
+    one behind. If the directory already exists, it is kept ('reuse'),
+    replaced ('overwrite') or reported by raising FileExistsError ('fail').
+
+    If a key is given (see result_cache.key), it is stored in the directory.
+    An existing directory created for a different key is stale: it is
+    replaced even under the 'reuse' policy. Directories without a stored key
+    are reused as before.
+
+    Inputs:
+        path = Job directory
+        overwrite = Policy for an existing directory (see policy)
+        populate = Function that writes the job files into the directory
+                given as its only argument (None = create an empty directory)
+        key = Cache key of the job (None = do not check for stale directories)
+
+    Returns True if the directory was created and False if an existing
+    directory was reused.
+    """
+    how = policy(overwrite)
+    if os.path.isdir(path):
+        stored = read_key(path) if key is not None else None
+        if how == 'reuse' and stored is not None and stored != key:
+            print("Replacing stale job directory: " + path)
+            how = 'overwrite'
+        if how == 'reuse': return False
+        if how == 'fail':
+            raise FileExistsError("Job directory already exists: " + path)
+
+    parent = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(parent): os.makedirs(parent)
+    prefix = '.' + os.path.basename(os.path.abspath(path)) + '.'
+    tmp = tempfile.mkdtemp(dir = parent, prefix = prefix)
+    os.chmod(tmp, 0o755)
+
+    try:
+        if populate is not None: populate(tmp)
+        if key is not None:
+            with open(tmp + os.sep + KEY_FILE, 'w') as key_file:
+                key_file.write(key + '\n')
+
+        if how == 'overwrite' and os.path.isdir(path):
+            # Move the old directory aside before removing it, so that the
+            # job directory is replaced in one step
+            old = tmp + '.old'
+            os.rename(path, old)
+            shutil.rmtree(old, ignore_errors = True)
+
+        os.rename(tmp, path)
+
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors = True)
+        if not os.path.isdir(path): raise
+
+        # Another job created the directory first
+        if how == 'reuse': return False
+        if how == 'fail':
+            raise FileExistsError("Job directory already exists: " + path)
+        return create(path, how, populate, key)
+
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors = True)
+        raise
+
+    return True
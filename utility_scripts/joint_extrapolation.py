@@ -0,0 +1,111 @@
+import numpy as np
+
+
+# Terms (exponent of h, exponent of t) of the tensor-product model that
+# interpolates a full 3 x 3 design. It is the model behind Richardson
+# extrapolation in grid spacing followed by Richardson extrapolation in
+# thickness (see richardson_extrapolation.re_124).
+TENSOR_TERMS = [(0, 0), (2, 0), (4, 0), (0, 2), (0, 4), (2, 2), (4, 2), (2, 4), (4, 4)]
+
+# Terms of the joint model f0 + a h^2 + b h^4 + c t^2 + d t^4 + e h^2 t^2
+JOINT_TERMS = TENSOR_TERMS[:6]
+
+# Designs: runs given as (grid level, thickness level), with level 0 the
+# coarsest grid and the thickest airfoil, and the model terms fitted to them
+DESIGNS = {
+    'full': ([(i, j) for i in range(3) for j in range(3)], TENSOR_TERMS),
+    'L': ([(0, 0), (1, 0), (2, 0), (0, 1), (0, 2), (1, 1)], JOINT_TERMS),
+    'diagonal': ([(0, 0), (1, 1), (2, 2), (1, 0), (0, 1), (1, 2)], JOINT_TERMS),
+}
+
+
+def design_points(design):
+    """Get the runs of a design as a list of (grid level, thickness level)
+
+    Inputs:
+        design = Name of one of DESIGNS, or a list of (grid level, thickness
+                level) tuples
+    """
+    if isinstance(design, str): return list(DESIGNS[design][0])
+    return [tuple(point) for point in design]
+
+
+def design_terms(design):
+    """Get the model terms fitted to a design (JOINT_TERMS for custom designs)
+    """
+    if isinstance(design, str): return list(DESIGNS[design][1])
+    return list(JOINT_TERMS)
+
+
+def fit(h, t, f, terms = JOINT_TERMS):
+    """Fit the two-parameter error model to results on several grids and thicknesses
+
+    The results are modeled as a sum of terms h^p t^q (see JOINT_TERMS) and
+    the coefficients are found by least squares (exactly, if there are as
+    many runs as terms).
+
+    Inputs:
+        h = Relative grid spacing of each run (e.g. npts[0] / npt)
+        t = Relative thickness of each run (e.g. t / ts[0])
+        f = Results of each run, shape (runs, ...), e.g. (runs, sections)
+        terms = Model terms as (exponent of h, exponent of t)
+
+    Returns the coefficients of the terms, shape (terms, ...).
+    """
+    h = np.asarray(h, dtype = float)
+    t = np.asarray(t, dtype = float)
+    f = np.asarray(f, dtype = float)
+    A = np.column_stack([h**p * t**q for p, q in terms])
+    if np.linalg.matrix_rank(A) < len(terms):
+        raise ValueError("The design does not determine all {} model terms".format(len(terms)))
+
+    # Scale the columns to improve the conditioning of the fit
+    scale = np.max(np.abs(A), axis = 0)
+    coefficients = np.linalg.lstsq(A / scale, f.reshape(len(A), -1), rcond = None)[0]
+    return (coefficients / scale[:, None]).reshape((len(terms),) + f.shape[1:])
+
+
+def extrapolate(h, t, f, terms = JOINT_TERMS):
+    """Extrapolate results to zero grid spacing and zero thickness
+
+    The error is estimated as the change in the extrapolated value when the
+    last (highest-order) term of the model is dropped.
+
+    Inputs:
+        h, t, f, terms = See fit
+
+    Returns the extrapolated value and its error estimate.
+    """
+    f0 = fit(h, t, f, terms)[0]
+    reduced = fit(h, t, f, terms[:-1])[0]
+    return (f0, np.abs(f0 - reduced))
+
+
+def compare(h, t, f, designs = ('L', 'diagonal')):
+    """Compare sparse designs against the full 3 x 3 design
+
+    Inputs:
+        h = Relative grid spacing of each grid level (3)
+        t = Relative thickness of each thickness level (3)
+        f = Results of the full design, shape (3, 3, ...) indexed by
+                (grid level, thickness level)
+        designs = Designs to compare (see design_points)
+
+    Returns the extrapolated value of the full design and a dictionary that
+    maps each design to (extrapolated value, error estimate, difference
+    from the full design).
+    """
+    f = np.asarray(f, dtype = float)
+
+    def run(design):
+        points = design_points(design)
+        return extrapolate([h[i] for i, j in points], [t[j] for i, j in points],
+                [f[i, j] for i, j in points], design_terms(design))
+
+    full = run('full')[0]
+    results = {}
+    for design in designs:
+        f0, error = run(design)
+        results[design if isinstance(design, str) else tuple(design)] = (f0, error, f0 - full)
+
+    return (full, results)
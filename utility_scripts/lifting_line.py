@@ -0,0 +1,333 @@
+import numpy as np
+
+from phd_scripts.utility_scripts import wing as wing_module
+from phd_scripts.utility_scripts import wing_cla
+from phd_scripts.utility_scripts import influence_cache
+
+
+# Closed-form elliptic-wing lift slopes associated with each low-aspect-ratio
+# correction. The correction is applied by scaling the induced angle of attack
+# so that an elliptic wing reproduces the corresponding relation exactly.
+LOWRA_METHODS = {
+    'Classical': wing_cla.a_classical,
+    'Hodson': wing_cla.a_hodson,
+    'ModifiedSlender': wing_cla.a_modified_slender,
+    'Kuchemann': wing_cla.a_kuchemann,
+    'Helmbold': wing_cla.a_helmbold,
+    'Jones': wing_cla.a_jones,
+    'Slender': lambda A, a0: wing_cla.a_slender(A),
+}
+
+
+def induced_factor(larc, A, a0 = 2.0 * np.pi):
+    r"""Calculate the induced-angle scale factor for a low-aspect-ratio correction
+
+    Classical lifting-line theory gives the elliptic-wing lift slope
+
+            a = \left( \frac{1}{a_0} + \frac{1}{\pi A} \right) ^{-1}
+
+    Each low-aspect-ratio correction is modeled by scaling the induced angle
+    of attack by a factor kappa, so that the elliptic-wing lift slope becomes
+
+            a = \left( \frac{1}{a_0} + \frac{\kappa}{\pi A} \right) ^{-1}
+
+    and kappa is chosen to reproduce the closed-form relation from wing_cla.
+    The same factor is then applied to wings of any planform.
+
+    Inputs:
+        larc = Low-aspect-ratio correction method (see LOWRA_METHODS)
+        A = Aspect ratio of wing (b^2 / Sw)
+        a0 = 2D section lift slope
+    """
+    if larc == 'Classical':
+        return np.ones(np.broadcast(A, a0).shape)[()]
+
+    if larc not in LOWRA_METHODS:
+        print("Unknown low-aspect-ratio method '{}', assuming 'Classical'".format(larc))
+        return induced_factor('Classical', A, a0)
+
+    a = LOWRA_METHODS[larc](A, a0)
+    return np.pi * A * (1.0 / a - 1.0 / a0)
+
+
+def nodes(nSec, symm = True):
+    """Calculate the spanwise collocation points and Fourier harmonics
+
+    The collocation points are evenly spaced in theta, where y = -b/2 cos(theta),
+    so that nSec + 1 points lie on each semispan (tip to root). This is the
+    same distribution used by the cosine-clustered Wing sections.
+
+    If symm == True, only the left semispan (0 <= theta <= pi/2) and the odd
+    harmonics are retained. Otherwise the full span and all harmonics are used.
+
+    Inputs:
+        nSec = Number of spanwise sections per semispan
+        symm = Use symmetry plane? True/False
+    """
+    if symm:
+        theta = np.linspace(0.0, np.pi / 2.0, nSec + 1)
+        n = np.arange(1, 2 * nSec + 2, 2)
+    else:
+        theta = np.linspace(0.0, np.pi, 2 * nSec + 1)
+        n = np.arange(1, 2 * nSec + 2)
+
+    return (theta, n)
+
+
+def sine_ratio(theta, n):
+    """Calculate sin(n theta) / sin(theta), including the limits at the wing tips
+
+    Inputs:
+        theta = Array of collocation points
+        n = Array of Fourier harmonics
+
+    Returns a matrix with one row per collocation point and one column per
+    harmonic.
+    """
+    theta = np.asarray(theta)[:, None]
+    n = np.asarray(n)[None, :]
+    s = np.sin(theta)
+    tip = np.isclose(s, 0.0)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        ratio = np.sin(n * theta) / s
+
+    limit = np.where(theta < np.pi / 2.0, n, n * (-1.0)**(n + 1))
+    return np.where(tip, limit, ratio)
+
+
+def chord_ratio(w, theta):
+    """Calculate the ratio c / sin(theta) at each collocation point
+
+    At the wing tips, this ratio is finite for an elliptic planform (equal to
+    the root chord) and infinite for planforms with a finite tip chord.
+
+    Inputs:
+        w = Wing object
+        theta = Array of collocation points
+    """
+    theta = np.asarray(theta)
+    s = np.sin(theta)
+    tip = np.isclose(s, 0.0)
+    c = np.ones(theta.shape) * w.chord_theta(theta)
+
+    if type(w) == wing_module.Elliptic:
+        tip_value = w.chord_theta(np.pi / 2.0)
+    else:
+        tip_value = np.inf
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return np.where(tip, tip_value, c / s)
+
+
+def solve(g, ratio, n, a0, kappa):
+    r"""Solve the lifting-line equation for the Fourier coefficients
+
+    The lifting-line equation at collocation point i is written as
+
+            \sum_n a_n \left( \frac{4 b}{a_0 c_i} + \frac{\kappa n}{\sin\theta_i}
+                \right) \sin(n \theta_i) = 1
+
+    so that the coefficients a_n are per radian of angle of attack.
+
+    Any leading dimensions of g, a0 and kappa are treated as a stack of
+    independent wings, which are solved together in a single call to
+    np.linalg.solve.
+
+    Inputs:
+        g = Array of 4b sin(theta) / c at each collocation point
+        ratio = Matrix of sin(n theta) / sin(theta) (see sine_ratio)
+        n = Array of Fourier harmonics
+        a0 = 2D section lift slope
+        kappa = Induced-angle scale factor (see induced_factor)
+    """
+    g = np.asarray(g, dtype = float)
+    a0 = np.asarray(a0, dtype = float)[..., None, None]
+    kappa = np.asarray(kappa, dtype = float)[..., None, None]
+
+    C = (g[..., :, None] / a0 + kappa * n) * ratio
+    rhs = np.ones(C.shape[:-1] + (1,))
+    return np.linalg.solve(C, rhs)[..., 0]
+
+
+def solve_batch(RA, RT = None, a0 = 2.0 * np.pi, larc = 'Classical', nSec = 100):
+    """Solve the lifting-line equation for a sweep of symmetric wings
+
+    All combinations of the (broadcast) inputs are assembled into a stack of
+    collocation systems and solved with a single call to np.linalg.solve. This
+    is intended for aspect-ratio sweeps where every wing uses the same number
+    of spanwise sections.
+
+    Inputs:
+        RA = Aspect ratio(s) of wing (b^2 / Sw)
+        RT = Taper ratio(s) (None or NaN = Elliptic planform, 1.0 = Rectangular)
+        a0 = 2D section lift slope(s)
+        larc = Low-aspect-ratio correction method(s) (see LOWRA_METHODS)
+        nSec = Number of spanwise sections per semispan
+
+    Returns a structured array with the broadcast shape of the inputs and the
+    fields RA, RT, a0, larc, CL_alpha, y (y/b from root to tip) and cl (section
+    lift coefficient per radian of angle of attack at each y).
+    """
+    if RT is None: RT = np.nan
+    RA, RT, a0, larc = np.broadcast_arrays(np.asarray(RA, dtype = float),
+            np.asarray(RT, dtype = float), np.asarray(a0, dtype = float),
+            np.asarray(larc))
+
+    theta, n = nodes(nSec, symm = True)
+    ratio = sine_ratio(theta, n)
+
+    # Calculate 4b sin(theta) / c for a unit average chord (b = RA). An
+    # elliptic wing has a constant value, while a tapered wing has a finite
+    # tip chord so the value vanishes at the tip.
+    elliptic = np.isnan(RT)[..., None]
+    rt = np.where(elliptic, 1.0, RT[..., None])
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        g_tapered = (2.0 * RA[..., None] * (1.0 + rt) * np.sin(theta) /
+                (1.0 - (1.0 - rt) * np.abs(np.cos(theta))))
+    g_tapered = np.where(np.isclose(np.sin(theta), 0.0), 0.0, g_tapered)
+    g = np.where(elliptic, np.pi * RA[..., None], g_tapered)
+
+    # Calculate the induced-angle scale factor for each correction method
+    kappa = np.ones(RA.shape)
+    for method in np.unique(larc):
+        mask = (larc == method)
+        kappa[mask] = induced_factor(method, RA[mask], a0[mask])
+
+    coefficients = solve(g, ratio, n, a0, kappa)
+
+    results = np.empty(RA.shape, dtype = [('RA', float), ('RT', float),
+            ('a0', float), ('larc', larc.dtype), ('CL_alpha', float),
+            ('y', float, (nSec + 1,)), ('cl', float, (nSec + 1,))])
+    results['RA'] = RA
+    results['RT'] = RT
+    results['a0'] = a0
+    results['larc'] = larc
+    results['CL_alpha'] = np.pi * RA * coefficients[..., 0]
+    results['y'] = 0.5 * np.cos(theta[::-1])
+
+    # Section lift coefficient: cl = 4b/c sum(a_n sin(n theta)), with c / c_avg
+    # recovered from g = 4b sin(theta) / c at each collocation point
+    cl = g * np.einsum('ij,...j->...i', ratio, coefficients)
+    results['cl'] = cl[..., ::-1]
+
+    return results
+
+
+class LiftingLine(object):
+    """In-process Fourier-series solution of Prandtl's lifting-line equation
+
+    This class is a drop-in replacement for the Pralines wrapper. It solves the
+    same truncated Fourier-series form of classical lifting-line theory for a
+    Wing object with no washout, and provides the same post-processing
+    interface (WingLiftSlope, WingLiftCoefficient and sec_cl) without writing
+    any files or launching an external process.
+    """
+    def __init__(self, wing, a0, larc, alpha = 1.0):
+        """Constructor
+
+        Inputs
+        ------
+        wing:   Wing object
+        a0:     Section lift slope
+        larc:   Low aspect ratio correction method
+                ('Classical', 'Hodson', 'ModifiedSlender', ...)
+        alpha:  Root angle of attack in degrees (used for WingLiftCoefficient)
+        """
+        self.wing = wing
+        self.a0 = a0
+        self.larc = larc
+        self.alpha = alpha
+
+        self._coefficients = None
+
+
+    @property
+    def name(self):
+        return "liftingline_{}_a{}_{}".format(self.larc, self.a0, self.wing.name)
+
+
+    def setup(self, overwrite = None):
+        """Prepare the analysis (no files are required)
+        """
+        self._coefficients = None
+        return True
+
+
+    def execute(self):
+        """Solve the lifting-line equation
+
+        The geometry-only matrices are shared between analyses of the same
+        wing through influence_cache.default_cache, so repeated solves with a
+        different a0 or low-aspect-ratio correction reuse one factorization.
+        """
+        key = influence_cache.wing_key(self.wing, 'fourier')
+        entry = influence_cache.default_cache.get(key, self.influence)
+        self.theta = entry['theta']
+        self.n = entry['n']
+        self.ratio = entry['ratio']
+        self.g = entry['g']
+
+        # Multiplying the lifting-line equation by a0 gives
+        #   (diag(g) R + a0 kappa R diag(n)) a = a0
+        # so only the product a0 * kappa is needed with the factored matrices
+        kappa = induced_factor(self.larc, self.wing.RA, self.a0)
+        rhs = self.a0 * np.ones(len(self.theta))
+        self._coefficients = influence_cache.spectral_solve(entry, rhs,
+                self.a0 * kappa, 1.0)
+
+
+    def influence(self):
+        """Build the geometry-only matrices for this wing
+
+        The lifting-line system (see solve) is written as
+        (diag(g) R + mu P) a = a0 rhs, where R = sine_ratio(theta, n),
+        P = R diag(n) and mu = a0 * kappa, and factored for any mu.
+        """
+        theta, n = nodes(self.wing.nSec, self.wing.symm)
+        ratio = sine_ratio(theta, n)
+        g = 4.0 * self.wing.b / chord_ratio(self.wing, theta)
+        P_inv = np.linalg.inv(ratio * n)
+        entry = influence_cache.eigen_factorization(
+                np.dot(g[:, None] * ratio, P_inv), left = P_inv)
+        entry.update({'theta': theta, 'n': n, 'ratio': ratio, 'g': g})
+        return entry
+
+
+    @property
+    def coefficients(self):
+        """Get the Fourier coefficients (per radian of angle of attack)
+        """
+        if self._coefficients is None: self.execute()
+        return self._coefficients
+
+
+    def sec_cl(self):
+        """Get the spanwise distribution of section lift coefficient
+
+        Returns the spanwise coordinates (y/b, from the left wing tip to the
+        right wing tip) and the ratio of section lift coefficient to the wing
+        lift coefficient, in the same format as Pralines.sec_cl.
+        """
+        coefficients = self.coefficients
+        cl = self.g * np.dot(self.ratio, coefficients) / self.WingLiftSlope
+        ys = -0.5 * np.cos(self.theta)
+        if self.wing.symm:
+            ys = np.concatenate([ys, -ys[-2::-1]])
+            cl = np.concatenate([cl, cl[-2::-1]])
+
+        return (ys, cl)
+
+
+    @property
+    def WingLiftSlope(self):
+        """Get the wing lift slope (per radian)
+        """
+        return np.pi * self.wing.RA * self.coefficients[0]
+
+
+    @property
+    def WingLiftCoefficient(self):
+        """Get the wing lift coefficient at the root angle of attack
+        """
+        return self.WingLiftSlope * np.radians(self.alpha)
@@ -1,18 +1,23 @@
 import numpy as np
 import os
-import shutil
-import time
 import json
+import subprocess
 from collections import OrderedDict
 
 import phd_scripts
 from phd_scripts.utility_scripts import airfoil
 from phd_scripts.utility_scripts import wing
+from phd_scripts.utility_scripts import job_directory
+from phd_scripts.utility_scripts import result_cache
+from phd_scripts.utility_scripts import sidecar
 
 
 class MachUp(object):
     """Wrapper class for creating, running, and post-processing MachUp lifting-line analyses
     """
+    # Files stored by result_cache.ResultCache
+    result_files = ['input_distributions.txt', 'input_forces.json', 'input_view.panair']
+    
     def __init__(self, airfoil, wing, template = 'input.json', templatedir = None,
             cmd = 'MachUp.exe', cmddir = None, jobdir = None):
         """Constructor
@@ -57,11 +62,20 @@ class MachUp(object):
             print("Error: Input template file '{}' does not exist.".format(template))
             return None
 
-        # Create the job directory
-        created = self.create_job_directory(overwrite)
-        if not created: return False
+        # Create the job directory containing the new input file
+        rendered = self.render()
+        def populate(jobdir):
+            with open(jobdir + os.sep + 'input.json', 'w') as inp_new:
+                inp_new.write(rendered)
+                
+        return self.create_job_directory(overwrite, populate, self.cache_key(rendered))
         
+        
+    def render(self):
+        """Generate the contents of the MachUp input file for this wing
+        """
         # Read and parse the template file
+        template = self.templatedir + os.sep + self.template
         with open(template, 'r') as inp_orig:
             input_data = json.load(inp_orig, object_pairs_hook = OrderedDict)
             
@@ -80,28 +94,49 @@ class MachUp(object):
         # Update the reference data
         input_data['reference'] = self.reference_data()
 
-        # Create the new input file in the job directory
-        with open(self.jobdir + os.sep + 'input.json', 'w') as inp_new:
-            json.dump(input_data, inp_new, indent = 4)
-            
-        return True
+        return json.dumps(input_data, indent = 4)
+        
+        
+    def cache_key(self, rendered = None):
+        """Get the result cache key of this job (see result_cache.key)
+
+        The input only names the airfoil, so the key also covers the
+        contents of its database entry. The location of the database is
+        left out, so that the key does not depend on where the repository
+        is checked out.
+        """
+        if rendered is None: rendered = self.render()
+        input_data = json.loads(rendered, object_pairs_hook = OrderedDict)
+        input_data['airfoil_DB'] = None
+        rendered = json.dumps(input_data, indent = 4)
+
+        airfoil = self.airfoil.dbdir + os.sep + self.airfoil.name
+        return result_cache.key(rendered, self.cmddir + os.sep + self.cmd,
+                [airfoil + '.json', airfoil + '_profile.txt'])
         
 
     def execute(self):
-        # Execute MachUp
-        cmd = self.cmddir + os.sep + self.cmd
-        job = self.jobdir + os.sep + 'input.json'
-        out = self.jobdir + os.sep + 'stdout.txt'
-        os.system("{} {} > {}".format(cmd, job, out))
+        """Execute MachUp and return its return code
+        """
+        jobdir = os.path.abspath(self.jobdir)
+        cmd = os.path.abspath(self.cmddir + os.sep + self.cmd)
+        job = jobdir + os.sep + 'input.json'
+        out = jobdir + os.sep + 'stdout.txt'
+        with open(out, 'w') as stdout:
+            return subprocess.call([cmd, job], stdout = stdout, cwd = jobdir)
         
         
     @property
     def distributions(self):
         """Read and parse the distributions result file
+
+        The parsed table is saved next to the file and reused while it is
+        unchanged (see sidecar.load).
         """
         if self._distributions is None:
             output_file = self.jobdir + os.sep + 'input_distributions.txt'
-            self._distributions = np.genfromtxt(output_file, names = True)
+            self._distributions = sidecar.load(output_file,
+                    lambda f: np.genfromtxt(f, names = True))
             
         return self._distributions
         
@@ -201,29 +236,11 @@ class MachUp(object):
         return self.forces['total']['myairplane']['CD']
 
         
-    def create_job_directory(self, overwrite = None):
-        """Creates a directory for the MachUp analysis and copies necessary files
+    def create_job_directory(self, overwrite = None, populate = None, key = None):
+        """Creates a directory for the MachUp analysis (see job_directory.create)
         """
         if self.jobdir is None: self.jobdir = self.name
-        if os.path.isdir(self.jobdir):
-            if overwrite is None:
-                print("Directory already exists: " + self.jobdir)
-                ow = input("Do you want to overwrite? (Y/n)\n")
-                if len(ow) > 0 and (ow[0] == 'n' or ow[0] == 'N'):
-                    overwrite = False
-                else:
-                    overwrite = True
-                    
-            if overwrite:
-                shutil.rmtree(self.jobdir)
-                time.sleep(1.0) # Give the file system some time...
-            else:
-                return False
-    
-        # Set up the job directory
-        os.mkdir(self.jobdir)
-        
-        return True
+        return job_directory.create(self.jobdir, overwrite, populate, key)
         
         
     def airfoil_data(self):
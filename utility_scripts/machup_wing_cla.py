@@ -1,7 +1,11 @@
 from phd_scripts.utility_scripts import airfoil
 from phd_scripts.utility_scripts import wing
 from phd_scripts.utility_scripts import machup
+from phd_scripts.utility_scripts import numerical_lifting_line
 from phd_scripts.utility_scripts import panair
+from phd_scripts.utility_scripts import executor
+from phd_scripts.utility_scripts import result_cache
+from phd_scripts.utility_scripts import results_db
 from phd_scripts.utility_scripts import richardson_extrapolation
 
 import matplotlib.pyplot as plt
@@ -19,7 +23,7 @@ plt.rcParams["lines.markersize"] = 4
 npts = 100
 
 def _run_machup(RA, RT = None, solver = None, lowra_method = None,
-        root_clustering = None, tip_clustering = None, viz = False):
+        root_clustering = None, tip_clustering = None, viz = False, backend = 'exe'):
     """Calculate the wing lift slope of a tapered wing using MachUp
     
     This function calculates the lift slope of a finite tapered wing using
@@ -35,6 +39,8 @@ def _run_machup(RA, RT = None, solver = None, lowra_method = None,
         root_clustering = Use cosine-clustering at the root? (True/False)
         tip_clustering = Use cosine-clustering at the tip? (True/False)
         viz = Visualize the spanwise lift coefficient? True/False
+        backend = Solver to use ('exe' = MachUp.exe,
+                'python' = in-process numerical_lifting_line.NumericalLiftingLine)
     """
     # Determine the average chord length to use for best results
     c = 1.0
@@ -53,15 +59,21 @@ def _run_machup(RA, RT = None, solver = None, lowra_method = None,
         w = wing.Tapered(RA, RT, b, npts, symm=True)
     
     # Create the MachUp solver
-    m = machup.MachUp(a, w)
+    if backend == 'python':
+        m = numerical_lifting_line.NumericalLiftingLine(a, w)
+    else:
+        m = machup.MachUp(a, w)
     m.solver = solver
     m.lowra_method = lowra_method
     m.root_clustering = root_clustering
     m.tip_clustering = tip_clustering
     
-    # Setup and execute
-    if(m.setup(overwrite = False)):
-        m.execute()
+    # Setup and execute, reusing MachUp.exe results from the result cache and
+    # recording new results in the results database
+    cache = None if backend == 'python' else result_cache.default_cache
+    if cache is None or not cache.lookup(m):
+        if(m.setup(overwrite = False)):
+            executor.run([m], cache = cache, db = results_db.default_db)
         
     # Plot the lift distribution
     if viz:
@@ -81,12 +93,14 @@ def _run_machup(RA, RT = None, solver = None, lowra_method = None,
     
     
 def sec_cl(RA, RT = None, solver = None, lowra_method = 'Classical',
-        root_clustering = None, tip_clustering = None, viz = False):
-    m = _run_machup(RA, RT, solver, lowra_method, root_clustering, tip_clustering, viz)
+        root_clustering = None, tip_clustering = None, viz = False, backend = 'exe'):
+    m = _run_machup(RA, RT, solver, lowra_method, root_clustering, tip_clustering, viz,
+            backend)
     return (m.sec_y[:npts] / m.wing.b, m.sec_CL[:npts], m.sec_c[:npts])
     
     
 def cla(RA, RT = None, solver = None, lowra_method = 'Classical',
-        root_clustering = None, tip_clustering = None, viz = False):
-    m = _run_machup(RA, RT, solver, lowra_method, root_clustering, tip_clustering, viz)
+        root_clustering = None, tip_clustering = None, viz = False, backend = 'exe'):
+    m = _run_machup(RA, RT, solver, lowra_method, root_clustering, tip_clustering, viz,
+            backend)
     return m.CL / np.radians(1.0)
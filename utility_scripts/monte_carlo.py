@@ -0,0 +1,303 @@
+import numpy as np
+
+from phd_scripts.utility_scripts import wing_cla
+
+
+def _elliptic(correlation, uses_a0 = True):
+    """Adapt an elliptic-wing correlation to the (A, a0, RT) model signature
+    """
+    if uses_a0: return lambda A, a0, RT: correlation(A, a0)
+    return lambda A, a0, RT: correlation(A)
+
+
+# Models evaluated by default, called as model(A, a0, RT) with arrays of
+# samples. The wing_cla correlations are for elliptic wings and ignore RT.
+CORRELATIONS = {
+    'Classical': _elliptic(wing_cla.a_classical),
+    'Slender': _elliptic(wing_cla.a_slender, False),
+    'Helmbold': _elliptic(wing_cla.a_helmbold),
+    'Jones': _elliptic(wing_cla.a_jones),
+    'vanDyke': _elliptic(wing_cla.a_vandyke),
+    'Germain': _elliptic(wing_cla.a_germain),
+    'HauptmanMiloh': _elliptic(wing_cla.a_hauptmanmiloh, False),
+    'Kuchemann': _elliptic(wing_cla.a_kuchemann),
+    'Hodson': _elliptic(wing_cla.a_hodson),
+    'ModifiedSlender': _elliptic(wing_cla.a_modified_slender),
+}
+
+
+def normal(mean, std):
+    """Normal distribution of an input, for use with propagate
+    """
+    return lambda rng, n: rng.normal(mean, std, n)
+
+
+def uniform(low, high):
+    """Uniform distribution of an input, for use with propagate
+    """
+    return lambda rng, n: rng.uniform(low, high, n)
+
+
+class Moments(object):
+    """Streaming mean and covariance of several variables
+
+    Batches of samples are combined with the pairwise update of Chan, Golub
+    and LeVeque (Welford's update generalized to batches), which is
+    numerically stable and lets the statistics of separate runs be merged.
+    """
+    def __init__(self, k):
+        """Constructor
+
+        Inputs
+        ------
+        k:          Number of variables
+        """
+        self.count = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))  # Sum of outer products of deviations
+
+
+    def update(self, values):
+        """Add a batch of samples, shape (samples, variables)
+        """
+        values = np.asarray(values, dtype = float)
+        if len(values) == 0: return
+        mean = np.mean(values, axis = 0)
+        deviations = values - mean
+        batch = Moments(len(mean))
+        batch.count = len(values)
+        batch.mean = mean
+        batch.comoment = deviations.T @ deviations
+        self.merge(batch)
+
+
+    def merge(self, other):
+        """Combine the statistics of another Moments object into this one
+        """
+        count = self.count + other.count
+        if count == 0: return
+        delta = other.mean - self.mean
+        self.comoment = (self.comoment + other.comoment +
+                np.outer(delta, delta) * (self.count * other.count / count))
+        self.mean = self.mean + delta * (other.count / count)
+        self.count = count
+
+
+    @property
+    def covariance(self):
+        """Get the sample covariance matrix
+        """
+        return self.comoment / max(self.count - 1, 1)
+
+
+    @property
+    def std(self):
+        """Get the sample standard deviation of each variable
+        """
+        return np.sqrt(np.diag(self.covariance))
+
+
+    @property
+    def correlation(self):
+        """Get the correlation matrix of the variables
+        """
+        std = self.std
+        return self.covariance / np.outer(std, std)
+
+
+class Histogram(object):
+    """Streaming histograms of several variables, used to estimate quantiles
+
+    Each variable is binned on a fixed range. Samples outside the range are
+    counted separately, together with the smallest and largest values, so no
+    sample is lost; quantiles that fall outside the range are interpolated
+    between the range and the extreme values.
+    """
+    def __init__(self, low, high, bins = 4096):
+        """Constructor
+
+        Inputs
+        ------
+        low:        Lower bound of the range of each variable (k)
+        high:       Upper bound of the range of each variable (k)
+        bins:       Number of bins in the range
+        """
+        self.low = np.asarray(low, dtype = float)
+        self.high = np.asarray(high, dtype = float)
+        self.bins = bins
+        k = len(self.low)
+
+        # Counts below the range, in each bin, and above the range
+        self.counts = np.zeros((k, bins + 2), dtype = np.int64)
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+
+
+    def update(self, values):
+        """Add a batch of samples, shape (samples, variables)
+        """
+        values = np.asarray(values, dtype = float)
+        if len(values) == 0: return
+        self.min = np.minimum(self.min, np.min(values, axis = 0))
+        self.max = np.maximum(self.max, np.max(values, axis = 0))
+
+        scale = self.bins / (self.high - self.low)
+        for j in range(len(self.low)):
+            index = np.clip((values[:, j] - self.low[j]) * scale[j] + 1.0, 0, self.bins + 1)
+            self.counts[j] += np.bincount(index.astype(np.int64), minlength = self.bins + 2)
+
+
+    def quantiles(self, q):
+        """Estimate quantiles of each variable
+
+        Inputs:
+            q = Quantile(s) between 0 and 1
+
+        Returns an array of shape (quantiles, variables).
+        """
+        q = np.atleast_1d(np.asarray(q, dtype = float))
+        result = np.empty((len(q), len(self.low)))
+        for j in range(len(self.low)):
+            step = (self.high[j] - self.low[j]) / self.bins
+            edges = np.concatenate([[min(self.min[j], self.low[j])],
+                    self.low[j] + step * np.arange(self.bins + 1),
+                    [max(self.max[j], self.high[j])]])
+            cumulative = np.concatenate([[0], np.cumsum(self.counts[j])])
+            result[:, j] = np.interp(q * cumulative[-1], cumulative, edges)
+
+        return result
+
+
+class Statistics(object):
+    """Streaming statistics of the outputs of several models
+
+    Combines Moments (mean, standard deviation, covariance and correlation
+    between models) with Histogram (quantiles). Memory use does not depend
+    on the number of samples.
+    """
+    def __init__(self, names, bins = 4096):
+        """Constructor
+
+        Inputs
+        ------
+        names:      Names of the models
+        bins:       Number of histogram bins for each model
+        """
+        self.names = list(names)
+        self.bins = bins
+        self.moments = Moments(len(self.names))
+        self.histogram = None
+        self.rejected = 0  # Samples with a non-finite output
+
+
+    def update(self, values):
+        """Add a batch of model outputs, shape (samples, models)
+
+        Samples for which any model is not finite (e.g. beyond an asymptote
+        of a correlation) are counted in rejected and otherwise ignored.
+        """
+        values = np.asarray(values, dtype = float)
+        finite = np.isfinite(np.sum(values, axis = 1))
+        if not np.all(finite):
+            self.rejected += int(np.sum(~finite))
+            values = values[finite]
+        if len(values) == 0: return
+
+        if self.histogram is None:
+            # The histogram range is set from the first batch, with a margin
+            low = np.min(values, axis = 0)
+            high = np.max(values, axis = 0)
+            margin = 0.25 * np.maximum(high - low, 1.0e-12 * np.maximum(np.abs(high), 1.0))
+            self.histogram = Histogram(low - margin, high + margin, self.bins)
+
+        self.moments.update(values)
+        self.histogram.update(values)
+
+
+    @property
+    def count(self):
+        return self.moments.count
+
+
+    @property
+    def mean(self):
+        return self.moments.mean
+
+
+    @property
+    def std(self):
+        return self.moments.std
+
+
+    @property
+    def correlation(self):
+        return self.moments.correlation
+
+
+    def quantiles(self, q = (0.05, 0.5, 0.95)):
+        """Estimate quantiles of each model (see Histogram.quantiles)
+        """
+        return self.histogram.quantiles(q)
+
+
+def sample(rng, inputs, n):
+    """Draw samples of the inputs of the models
+
+    Inputs:
+        rng = NumPy random Generator
+        inputs = Dictionary mapping 'A', 'a0' and 'RT' to a distribution
+                (see normal and uniform) or a constant
+        n = Number of samples
+
+    Returns a dictionary of arrays of n samples.
+    """
+    defaults = {'a0': 2.0 * np.pi, 'RT': np.nan}
+    samples = {}
+    for name in ('A', 'a0', 'RT'):
+        value = inputs.get(name, defaults.get(name))
+        if callable(value): samples[name] = np.asarray(value(rng, n), dtype = float)
+        else: samples[name] = np.full(n, value, dtype = float)
+
+    return samples
+
+
+def propagate(inputs, models = None, n = 1000000, chunk = 65536, seed = None,
+        bins = 4096, statistics = None):
+    """Propagate input uncertainty through lift-slope models by Monte Carlo sampling
+
+    The samples are drawn and evaluated in chunks, so memory use is bounded
+    by the chunk size. The statistics are accumulated as the chunks are
+    evaluated (see Statistics), so several calls (e.g. with different seeds
+    in separate processes) can be combined with Moments.merge.
+
+    Inputs:
+        inputs = Distributions of the inputs (see sample). For example,
+                {'A': uniform(1.0, 4.0), 'a0': normal(2.0 * np.pi, 0.1)}
+        models = Dictionary mapping names to functions of (A, a0, RT), or a
+                list of names from CORRELATIONS (None = all CORRELATIONS)
+        n = Number of samples
+        chunk = Number of samples evaluated together
+        seed = Seed of the random number generator
+        bins = Number of histogram bins used for the quantiles
+        statistics = Statistics to continue accumulating (None = new)
+
+    Returns a Statistics object with the mean, standard deviation,
+    correlation and quantiles of each model.
+    """
+    if models is None: models = CORRELATIONS
+    if not isinstance(models, dict):
+        models = {name: CORRELATIONS[name] for name in models}
+
+    rng = np.random.default_rng(seed)
+    if statistics is None: statistics = Statistics(models.keys(), bins)
+
+    for start in range(0, n, chunk):
+        samples = sample(rng, inputs, min(chunk, n - start))
+        # Each model fills a contiguous row; the transpose is passed on
+        values = np.empty((len(models), len(samples['A'])))
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            for j, model in enumerate(models.values()):
+                values[j] = model(samples['A'], samples['a0'], samples['RT'])
+        statistics.update(values.T)
+
+    return statistics
@@ -0,0 +1,274 @@
+import numpy as np
+import os
+import copy
+import json
+from collections import OrderedDict
+
+from phd_scripts.utility_scripts import machup
+from phd_scripts.utility_scripts import lifting_line
+from phd_scripts.utility_scripts import influence_cache
+
+
+def horseshoe_velocities(points, nodes1, nodes2, u_inf):
+    """Calculate the velocity induced at each point by each horseshoe vortex
+
+    This function evaluates the velocity induced by a horseshoe vortex of unit
+    strength using the relation given by Phillips and Snyder (2000). The
+    trailing legs of each horseshoe vortex are aligned with the freestream.
+    Contributions from bound segments that are colinear with a point (such as
+    a control point on its own bound vortex) are taken as zero.
+
+    Inputs:
+        points = (N, 3) array of control point coordinates
+        nodes1 = (M, 3) array of the first node of each bound vortex
+        nodes2 = (M, 3) array of the second node of each bound vortex
+        u_inf = Unit vector in the direction of the freestream
+
+    Returns an (N, M, 3) array of induced velocities.
+    """
+    r1 = points[:, None, :] - nodes1[None, :, :]
+    r2 = points[:, None, :] - nodes2[None, :, :]
+    r1_mag = np.linalg.norm(r1, axis = -1)
+    r2_mag = np.linalg.norm(r2, axis = -1)
+
+    # Trailing vortex segments
+    v = (np.cross(u_inf, r2) /
+            (r2_mag * (r2_mag - np.dot(r2, u_inf)))[..., None])
+    v -= (np.cross(u_inf, r1) /
+            (r1_mag * (r1_mag - np.dot(r1, u_inf)))[..., None])
+
+    # Bound vortex segment
+    r1xr2 = np.cross(r1, r2)
+    denom = r1_mag * r2_mag * (r1_mag * r2_mag + np.sum(r1 * r2, axis = -1))
+    colinear = np.linalg.norm(r1xr2, axis = -1) <= 1.0e-12 * r1_mag * r2_mag
+    denom = np.where(colinear, 1.0, denom)
+    bound = (r1_mag + r2_mag)[..., None] * r1xr2 / denom[..., None]
+    v += np.where(colinear[..., None], 0.0, bound)
+
+    return v / (4.0 * np.pi)
+
+
+class NumericalLiftingLine(machup.MachUp):
+    """In-process numerical lifting-line analysis (Phillips and Snyder)
+
+    This class is an alternative to the MachUp wrapper that solves the
+    numerical lifting-line method of Phillips and Snyder directly in Python.
+    It reads the same template file for the flight condition and solver
+    settings, and exposes the results through the same properties (sec_y,
+    sec_CL, sec_c, CL, CD, ...) without creating a job directory or launching
+    MachUp.exe.
+
+    The wing is modeled as a straight, unswept lifting line at the quarter
+    chord, with one horseshoe vortex per spanwise section. Low-aspect-ratio
+    corrections scale the induced velocity in the same way as in
+    lifting_line.induced_factor. The influence matrices are shared between
+    analyses of the same wing through influence_cache.default_cache.
+    """
+    def setup(self, overwrite = None):
+        """Read the template and airfoil data used by the analysis
+        """
+        # Make sure the airfoil exists in the database
+        error = self.airfoil.create_airfoil()
+        if error: return None
+
+        # Make sure the template file exists
+        template = self.templatedir + os.sep + self.template
+        if not os.path.isfile(template):
+            print("Error: Input template file '{}' does not exist.".format(template))
+            return None
+
+        # Read and parse the template file
+        with open(template, 'r') as inp_orig:
+            self.input_data = json.load(inp_orig, object_pairs_hook = OrderedDict)
+
+        # Read the airfoil properties from the airfoil database
+        airfoil_file = self.airfoil.dbdir + os.sep + self.airfoil.name + '.json'
+        with open(airfoil_file, 'r') as affile:
+            afdata = json.load(affile, object_pairs_hook = OrderedDict)
+        self.airfoil_properties = afdata[self.airfoil.name]['properties']
+
+        self._distributions = None
+        self._forces = None
+        return True
+
+
+    def execute(self):
+        """Solve the numerical lifting-line equations
+        """
+        if self._distributions is not None: return
+
+        solver = self.input_data['solver']
+        solver_type = self.solver if self.solver is not None else solver['type']
+        lowra_method = self.lowra_method
+        if lowra_method is None:
+            lowra_method = self.input_data['wings']['wing_1'].get(
+                    'low_aspect_ratio_method', 'Classical')
+
+        CLa = self.airfoil_properties['CL_alpha']
+        aL0 = self.airfoil_properties.get('alpha_L0', 0.0)
+        CD0 = self.airfoil_properties.get('CD0', 0.0)
+
+        # Freestream direction (x aft, y right, z up)
+        alpha = np.radians(self.input_data['condition']['alpha'])
+        u_inf = np.array([np.cos(alpha), 0.0, np.sin(alpha)])
+        u_a = np.array([1.0, 0.0, 0.0])
+        u_n = np.array([0.0, 0.0, 1.0])
+
+        # Geometry-only influence matrices for this wing and flight condition
+        w = self.wing
+        key = influence_cache.wing_key(w, 'horseshoe', float(alpha))
+        entry = influence_cache.default_cache.get(key,
+                lambda: self.influence(u_inf, u_n))
+        points = entry['points']
+        dl = entry['dl']
+        c = entry['c']
+        dA = entry['dA']
+
+        kappa = lifting_line.induced_factor(lowra_method, w.RA, CLa)
+        v = kappa * entry['v']
+
+        # Solve the linearized system using the cached factorization
+        a_inf = np.arctan2(np.dot(u_inf, u_n), np.dot(u_inf, u_a))
+        b = CLa * dA * (a_inf - aL0)
+        G = influence_cache.spectral_solve(entry, b, 1.0, -CLa * kappa)
+
+        # Solve the nonlinear system using Newton's method
+        if solver_type == 'nonlinear':
+            tol = solver.get('convergence', 1.0e-10)
+            omega = solver.get('relaxation', 1.0)
+            for i in range(100):
+                W = u_inf + np.einsum('ijk,j->ik', v, G)
+                wxdl = np.cross(W, dl)
+                wxdl_mag = np.linalg.norm(wxdl, axis = -1)
+                Wa = np.dot(W, u_a)
+                Wn = np.dot(W, u_n)
+                a_i = np.arctan2(Wn, Wa)
+                R = 2.0 * wxdl_mag * G - CLa * (a_i - aL0) * dA
+                if np.max(np.abs(R)) < tol: break
+
+                vxdl = np.cross(v, dl[:, None, :])
+                dadG = ((np.dot(v, u_n) * Wa[:, None] - np.dot(v, u_a) * Wn[:, None]) /
+                        (Wa**2 + Wn**2)[:, None])
+                J = (np.diag(2.0 * wxdl_mag) +
+                        2.0 * G[:, None] * np.einsum('ik,ijk->ij', wxdl, vxdl) / wxdl_mag[:, None] -
+                        (CLa * dA)[:, None] * dadG)
+                G = G - omega * np.linalg.solve(J, R)
+
+        # Section properties and forces (the right semispan first, then the
+        # left semispan, each from root to tip)
+        W = u_inf + np.einsum('ijk,j->ik', v, G)
+        a_i = np.arctan2(np.dot(W, u_n), np.dot(W, u_a))
+        F = G[:, None] * np.cross(W, dl)
+        sec_CL = CLa * (a_i - aL0)
+
+        u_lift = np.array([-np.sin(alpha), 0.0, np.cos(alpha)])
+        S = self.reference_data()['area']
+        CL = 2.0 * np.sum(np.dot(F, u_lift)) / S
+        CD = 2.0 * np.sum(np.dot(F, u_inf)) / S + np.sum(CD0 * dA) / S
+        if w.symm:
+            CL *= 2.0
+            CD *= 2.0
+            points = np.concatenate([points, points * [1.0, -1.0, 1.0]])
+            c = np.concatenate([c, c])
+            dA = np.concatenate([dA, dA])
+            a_i = np.concatenate([a_i, a_i])
+            sec_CL = np.concatenate([sec_CL, sec_CL])
+        else:
+            # Report the right semispan first, then the left (root to tip)
+            n = len(c) // 2
+            order = np.concatenate([np.arange(n, 2 * n), np.arange(n - 1, -1, -1)])
+            points, c, dA, a_i, sec_CL = [x[order] for x in (points, c, dA, a_i, sec_CL)]
+
+        self._distributions = np.zeros(len(c), dtype = [('ControlPointx', float),
+                ('ControlPointy', float), ('ControlPointz', float), ('Chord', float),
+                ('Twistdeg', float), ('Area', float), ('Section_Alphadeg', float),
+                ('Section_CL', float), ('Section_CD_parasitic', float),
+                ('Section_alpha_L0deg', float)])
+        self._distributions['ControlPointx'] = points[:, 0]
+        self._distributions['ControlPointy'] = points[:, 1]
+        self._distributions['ControlPointz'] = points[:, 2]
+        self._distributions['Chord'] = c
+        self._distributions['Area'] = dA
+        self._distributions['Section_Alphadeg'] = np.degrees(a_i)
+        self._distributions['Section_CL'] = sec_CL
+        self._distributions['Section_CD_parasitic'] = CD0
+        self._distributions['Section_alpha_L0deg'] = np.degrees(aL0)
+
+        self._forces = OrderedDict()
+        self._forces['total'] = OrderedDict()
+        self._forces['total']['myairplane'] = OrderedDict([('CL', CL), ('CD', CD)])
+
+
+    def influence(self, u_inf, u_n):
+        """Build the geometry-only influence matrices for this wing
+
+        The linearized system
+
+                2 |u_inf x dl_i| G_i - CL_alpha dA_i \sum_j (v_ij . u_n) G_j = r_i
+
+        is factored so that it can be solved for any section lift slope and
+        low-aspect-ratio correction (see influence_cache.eigen_factorization).
+
+        Inputs:
+            u_inf = Unit vector in the direction of the freestream
+            u_n = Unit vector normal to the wing sections
+        """
+        # Spanwise nodes, control points, chords and areas on the right
+        # semispan (root to tip)
+        w = self.wing
+        semispan = copy.copy(w)
+        semispan.symm = True
+        semispan.create_sections()
+        y = semispan.y
+        yc = semispan.yc
+        c = np.ones(len(yc)) * w.chord_theta(w.thetacoord(yc))
+        dA = w.c_integral(y[1:]) - w.c_integral(y[:-1])
+
+        # Full-span horseshoe vortices, with the left semispan (tip to root)
+        # followed by the right semispan (root to tip)
+        ny = len(y)
+        nodes = np.zeros((2 * ny - 1, 3))
+        nodes[:, 1] = np.concatenate([-y[::-1], y[1:]])
+        points = np.zeros((2 * len(yc), 3))
+        points[:, 1] = np.concatenate([-yc[::-1], yc])
+        v = horseshoe_velocities(points, nodes[:-1], nodes[1:], u_inf)
+        dl = nodes[1:] - nodes[:-1]
+        c = np.concatenate([c[::-1], c])
+        dA = np.concatenate([dA[::-1], dA])
+
+        # Fold the left semispan onto the right using the plane of symmetry
+        if w.symm:
+            n = len(yc)
+            v = v[n:, n:] + v[n:, n - 1::-1]
+            dl = dl[n:]
+            c = c[n:]
+            dA = dA[n:]
+            points = points[n:]
+
+        uxdl = np.linalg.norm(np.cross(u_inf, dl), axis = -1)
+        K = (dA / (2.0 * uxdl))[:, None] * np.dot(v, u_n)
+        entry = influence_cache.eigen_factorization(K, right = np.diag(1.0 / (2.0 * uxdl)))
+        entry.update({'points': points, 'dl': dl, 'c': c, 'dA': dA, 'v': v})
+
+        return entry
+
+
+    @property
+    def distributions(self):
+        """Get the spanwise distributions (solving the problem if necessary)
+        """
+        if self._distributions is None: self.execute()
+        return self._distributions
+
+
+    @property
+    def forces(self):
+        """Get the integrated forces (solving the problem if necessary)
+        """
+        if self._forces is None: self.execute()
+        return self._forces
+
+
+    @property
+    def name(self):
+        return "nll" + super().name[len("machup"):]
@@ -1,13 +1,18 @@
 import numpy as np
 import os
 import shutil
-import time
 import re
 import glob
+import mmap
+import subprocess
 import matplotlib.pyplot as plt
 
 import phd_scripts
 from phd_scripts.utility_scripts import richardson_extrapolation
+from phd_scripts.utility_scripts import job_directory
+from phd_scripts.utility_scripts import result_cache
+from phd_scripts.utility_scripts import section_kernels
+from phd_scripts.utility_scripts import sidecar
 
 
 # Set up global plot parameters
@@ -20,6 +25,9 @@ plt.rcParams["lines.markersize"] = 4
 class Panair(object):
     """Wrapper class for creating, running, and post-processing Panair panel code analyses
     """
+    # Files stored by result_cache.ResultCache
+    result_files = ['agps', 'panair_stdout']
+    
     def __init__(self, airfoil, wing, input_file,
             cmd = 'panair.exe', cmddir = None, jobdir = None):
         """Constructor
@@ -34,10 +42,14 @@ class Panair(object):
                 
         self.jobdir = jobdir if jobdir is not None else self.name
         
+        # Chordwise pressure integration rule (see section_kernels.QUADRATURES)
+        self.quadrature = 'trapezoid'
+        
         self._distributions = None
         self._sec_y = None
         self._sec_c = None
         self._sec_CL = None
+        self._sec_CL_error = None
         
         
     def setup(self, overwrite = None):
@@ -47,110 +59,87 @@ class Panair(object):
             return True
             
         # Create the job directory
-        if os.path.isdir(self.jobdir):
-            if overwrite is None:
-                print("Directory already exists: " + self.jobdir)
-                ow = input("Do you want to overwrite? (Y/n)\n")
-                if len(ow) > 0 and (ow == 'n' or ow == 'N'):
-                    overwrite = False
-                else:
-                    overwrite = True
-                    
-            if overwrite:
-                shutil.rmtree(self.jobdir)
-                time.sleep(1.0) # Give the file system some time...
-            else:
-                return False
-        
-        # Create the new job directory
-        os.mkdir(self.jobdir)
-        time.sleep(1.0) # Give the file system some time...
-        
-        # Copy the executable into the job directory
-        shutil.copyfile(self.cmddir + os.sep + self.cmd,
-                self.jobdir + os.sep + self.cmd)
-        
-        # Copy the input file into the job directory
-        input_file_new = self.name + '.panair'
-        shutil.copyfile(self.input_file, self.jobdir + os.sep + input_file_new)
-        
-        # Create an input file to pipe into the execution command
-        with open(self.jobdir + os.sep + 'pipe', 'w') as pipe_file:
-            pipe_file.write(input_file_new + '\n')
-
-        return True
+        def populate(jobdir):
+            # Copy the executable into the job directory
+            shutil.copyfile(self.cmddir + os.sep + self.cmd,
+                    jobdir + os.sep + self.cmd)
+            shutil.copymode(self.cmddir + os.sep + self.cmd,
+                    jobdir + os.sep + self.cmd)
+            
+            # Copy the input file into the job directory
+            input_file_new = self.name + '.panair'
+            shutil.copyfile(self.input_file, jobdir + os.sep + input_file_new)
+            
+            # Create an input file to pipe into the execution command
+            with open(jobdir + os.sep + 'pipe', 'w') as pipe_file:
+                pipe_file.write(input_file_new + '\n')
+                
+        return job_directory.create(self.jobdir, overwrite, populate, self.cache_key())
+    
+    
+    def render(self):
+        """Get the contents of the Panair input deck
+        """
+        with open(self.input_file, 'rb') as deck:
+            return deck.read()
+            
+            
+    def cache_key(self, rendered = None):
+        """Get the result cache key of this job (see result_cache.key)
+        """
+        if rendered is None: rendered = self.render()
+        return result_cache.key(rendered, self.cmddir + os.sep + self.cmd)
     
     
     def execute(self):
-        """Execute the Panair analysis
+        """Execute the Panair analysis and return its return code
+        
+        Panair is run with the job directory as its working directory, without
+        changing the working directory of this process.
         """
-        # Move into the job directory
-        cwd = os.getcwd()
-        os.chdir(self.jobdir)
+        jobdir = os.path.abspath(self.jobdir)
+        with open(jobdir + os.sep + 'pipe', 'r') as stdin, open(
+                jobdir + os.sep + 'panair_stdout', 'w') as stdout:
+            returncode = subprocess.call([jobdir + os.sep + self.cmd],
+                    stdin = stdin, stdout = stdout, cwd = jobdir)
+            
+        # Remove the scratch files
+        [os.remove(file) for file in glob.glob(jobdir + os.sep + 'rwms*')]
+        [os.remove(file) for file in glob.glob(jobdir + os.sep + 'ft*')]
         
-        # Execute Panair
-        os.system(self.cmd + " < pipe > panair_stdout")
-        [os.remove(file) for file in glob.glob('rwms*')]
-        [os.remove(file) for file in glob.glob('ft*')]
-
-        # Return to the original work directory
-        os.chdir(cwd)
+        return returncode
         
         
     @property
     def distributions(self):
+        """Read the surface distributions of the wing from the agps file (see read_agps)
+
+        The parsed distributions are saved next to the agps file and reused
+        while it is unchanged (see sidecar.load).
+        """
         if self._distributions is None:
             resfilename = self.jobdir + os.sep + 'agps'
             if not os.path.isfile(resfilename):
                 print("Panair output file '{}' does not exist!".format(resfilename))
                 return None
                 
-            with open(resfilename, 'r') as resfile:
-                lines = resfile.readlines()
-                
-            network = None
-            column = None
-            self._distributions = []
-            dist1 = []
-            dist2 = []
-            for line in lines[6:]:
-                if re.match('n[0-9]*c[0-9]*', line) is not None:
-                    network = int(line[1:3])
-                    if network == 3 or network == 6: continue  # Don't parse the wake network
-                    
-                    column = int(line[4:7])
-                    if (network < 3 and column <= len(dist1)):
-                        table = dist1[column - 1]  # Append to existing table (wing 1)
-                    elif (network > 3 and column <= len(dist2)):
-                        table = dist2[column - 1]  # Append to existing table (wing 2)
-                    else:
-                        table = {'x': [], 'y': [], 'z': [], 'cp': []}  # Create new table
-                    
-                elif re.match('\*eof', line) is not None:
-                    if column is not None:
-                        if network < 3 and column > len(dist1):
-                            dist1.append(table)
-                        elif network > 3 and column > len(dist2):
-                            dist2.append(table)
-                    table = None
-                    network = None
-                    column = None
-                    
-                elif re.match(' irow', line) is not None:
-                    pass
-                    
-                elif table is not None:
-                    data = line.split()
-                    table['x'].append(float(data[1]))
-                    table['y'].append(float(data[2]))
-                    table['z'].append(float(data[3]))
-                    table['cp'].append(float(data[4]))
-    
-            if self.wing.symm: self._distributions = dist1
-            else: self._distributions = np.concatenate((dist2[:-1:], dist1[:]))
+            suffix = '.symm.npy' if self.wing.symm else '.full.npy'
+            self._distributions = sidecar.load(resfilename,
+                    lambda f: read_agps(f, self.wing.symm), suffix)
         return self._distributions
 
 
+    def read_columns(self, columns):
+        """Read the surface distributions of selected sections from the agps file
+
+        Inputs:
+            columns = Network columns (sections, starting at 1 at the root of
+                    the right wing) to read (see read_agps)
+        """
+        resfilename = self.jobdir + os.sep + 'agps'
+        return read_agps(resfilename, self.wing.symm, columns)
+
+
     @property
     def sec_CL(self):
         """Get the section lift distribution by integrating pressure over each wing section
@@ -158,14 +147,28 @@ class Panair(object):
         Note: Values are interpolated to section theta-midpoints
         """
         if self._sec_CL is None:
-            secCL = np.asarray([integrate(dist['cp'], dist['x'])
-                    for dist in self.distributions])
-            self._sec_CL = interpolate(self.wing.y[:-1], self.wing.y[1:],
-                    secCL[:-1], secCL[1:], self.wing.yc) / self.sec_c
+            dist = self.distributions
+            secCL, secErr = section_kernels.quadrature(dist['cp'], dist['x'],
+                    dist['npts'], self.quadrature)
+            self._sec_CL = section_kernels.midpoints(self.wing.y, secCL,
+                    self.wing.yc) / self.sec_c
+            self._sec_CL_error = section_kernels.midpoints(self.wing.y, secErr,
+                    self.wing.yc) / self.sec_c
                 
         return self._sec_CL
 
 
+    @property
+    def sec_CL_error(self):
+        """Get an estimate of the chordwise integration error in sec_CL
+        
+        The estimate compares the integral over all chordwise points with the
+        integral over every other point (see section_kernels.quadrature).
+        """
+        if self._sec_CL_error is None: self.sec_CL
+        return self._sec_CL_error
+
+
     @property
     def sec_y(self):
         """Get the section y-coordinates from the distribution table
@@ -173,7 +176,7 @@ class Panair(object):
         Note: Values are interpolated to section theta-midpoints
         """
         if self._sec_y is None:
-            secY = np.asarray([dist['y'][0] for dist in self.distributions])
+            secY = self.distributions['y'][:, 0]
             self._sec_y = 0.5 * (secY[:-1] + secY[1:])
 #            self._sec_y = interpolate(self.wing.y[:-1], self.wing.y[1:],
 #                    secY[:-1], secY[1:], self.wing.yc)
@@ -188,9 +191,9 @@ class Panair(object):
         Note: Values are interpolated to section theta-midpoints
         """
         if self._sec_c is None:
-            secC = np.asarray([max(dist['x']) - min(dist['x']) for dist in self.distributions])
-            self._sec_c = interpolate(self.wing.y[:-1], self.wing.y[1:],
-                    secC[:-1], secC[1:], self.wing.yc)
+            dist = self.distributions
+            secC = section_kernels.chord(dist['x'], dist['npts'])
+            self._sec_c = section_kernels.midpoints(self.wing.y, secC, self.wing.yc)
                 
         return self._sec_c
         
@@ -226,55 +229,234 @@ class Panair(object):
         plt.show()
         
         
-def extrapolate_CL(panair1, panair2, panair3):
-    """Extrapolate CL values based on three grid refinements
+def extrapolate_CL(*panairs):
+    """Extrapolate CL values based on successive grid refinements
     
     This function extrapolates spanwise section lift coefficients using
-    Richardson extrapolation on results from three Panair panel code
-    simulations with successively-refined meshes. It is assumed that each
-    successive mesh refinement doubles the number of spanwise sections
-    over the previous grid.
+    Richardson extrapolation on results from Panair panel code simulations
+    with successively-refined meshes. The section lift coefficients of each
+    mesh are averaged onto the sections of the coarsest mesh using the
+    area-weighted restriction operators of its wing (see
+    wing.Wing.restriction), so any refinement ratio can be used. Three
+    meshes are extrapolated as before (see richardson_extrapolation.
+    extrapolate); any other number of meshes uses
+    richardson_extrapolation.re_romberg.
     
-    panair1 = coarse-mesh analysis
-    panair2 = medium-mesh analysis
-    panair3 = fine-mesh analysis
+    panairs = Panair analyses, from the coarsest to the finest mesh
     """
-    clp1 = panair1.sec_CL
-    
-    clp2 = np.asarray([(cl1 * a1 + cl2 * a2) / (a1 + a2) for a1, a2, cl1, cl2 in
-            zip(panair2.wing.sec_Area[:-1:2], panair2.wing.sec_Area[1::2],
-            panair2.sec_CL[:-1:2], panair2.sec_CL[1::2])])
-    
-    clp3 = np.asarray([(cl1 * a1 + cl2 * a2 + cl3 * a3 + cl4 * a4) / (a1 + a2 + a3 + a4)
-            for a1, a2, a3, a4, cl1, cl2, cl3, cl4 in zip(
-            panair3.wing.sec_Area[:-3:4], panair3.wing.sec_Area[1:-2:4],
-            panair3.wing.sec_Area[2:-1:4], panair3.wing.sec_Area[3::4],
-            panair3.sec_CL[:-3:4], panair3.sec_CL[1:-2:4],
-            panair3.sec_CL[2:-1:4], panair3.sec_CL[3::4])])
+    coarse = panairs[0].wing
+    ms = [p.wing.nSec / coarse.nSec for p in panairs]
+    clps = [panairs[0].sec_CL] + [p.wing.restriction(coarse) @ p.sec_CL
+            for p in panairs[1:]]
     
-    (cl_extrapolated, order) = richardson_extrapolation.extrapolate(1, 2, 4, clp1, clp2, clp3)
-    y_extrapolated = panair1.sec_y
+    if len(panairs) == 3:
+        (cl_extrapolated, order) = richardson_extrapolation.extrapolate(
+                ms[0], ms[1], ms[2], clps[0], clps[1], clps[2])
+    else:
+        (cl_extrapolated, order) = richardson_extrapolation.re_romberg(ms, clps)
+    y_extrapolated = panairs[0].sec_y
     return (y_extrapolated, cl_extrapolated)
 
 
+# Patterns marking the start (network/column header) and end of an agps block
+_AGPS_HEADER = re.compile('n[0-9]*c[0-9]*')
+_AGPS_EOF = re.compile(r'\*eof')
+_AGPS_COLUMNS = re.compile(' irow')
+_AGPS_HEADER_BYTES = re.compile(b'n[0-9]*c[0-9]*')
+_AGPS_EOF_BYTES = re.compile(rb'\*eof')
+
+
+def agps_blocks(resfile, skip = (3, 6)):
+    """Walk through an agps file, yielding the data lines of each block
+
+    Each block of an agps file holds the solution for one column of one
+    network. The file is read one line at a time, and the data lines of
+    skipped networks (by default the wake networks) are never stored.
+
+    Inputs:
+        resfile = agps file object
+        skip = Networks to skip
+
+    Yields (network, column, lines) for each block.
+    """
+    network = None
+    for n, line in enumerate(resfile):
+        if n < 6: continue  # File header
+        
+        if network is None:
+            if _AGPS_HEADER.match(line) is not None:
+                network = int(line[1:3])
+                column = int(line[4:7])
+                skipping = network in skip
+                lines = []
+                
+        elif _AGPS_EOF.match(line) is not None:
+            if not skipping: yield (network, column, lines)
+            network = None
+            
+        elif not skipping and _AGPS_COLUMNS.match(line) is None:
+            lines.append(line)
+
+
+def agps_table(lines):
+    """Convert the data lines of an agps block to an (n, 4) array of x, y, z, cp
+    """
+    if len(lines) == 0: return np.zeros((0, 4))
+    ncols = len(lines[0].split())
+    values = np.array(''.join(lines).split(), dtype = float)
+    return values.reshape((len(lines), ncols))[:, 1:5]
+
+
+def agps_distributions(blocks, symm, join = True):
+    """Assemble agps blocks into the section distributions of the wing
+
+    The upper and lower surface networks (1 and 2 for the right wing, 4 and 5
+    for the left wing) are joined column by column, so each section runs
+    around the whole airfoil. Other networks (wakes and tip caps) are
+    ignored.
+
+    Inputs:
+        blocks = Iterable of (network, column, table) tuples (see agps_blocks
+                and agps_table)
+        symm = Is only the right semispan modeled? (True/False)
+        join = For full wings, drop the root column of the left wing (shared
+                with the right wing) and order the sections from the left tip
+                to the right tip? (True/False)
+
+    Returns a NumPy structured array with one row per section. The fields x,
+    y, z and cp hold the surface points, padded with NaN beyond npts points.
+    """
+    wings = {1: 0, 2: 0, 4: 1, 5: 1}
+    columns = ({}, {})
+    for network, column, table in blocks:
+        if network not in wings: continue
+        columns[wings[network]].setdefault(column, []).append(table)
+
+    tables = [[np.concatenate(c[k]) for k in sorted(c)] for c in columns]
+    if symm: tables = tables[0]
+    elif join: tables = tables[1][:-1] + tables[0]
+    else: tables = tables[1] + tables[0]
+
+    npts = max(len(t) for t in tables)
+    dist = np.zeros(len(tables), dtype = [('npts', int), ('x', float, (npts,)),
+            ('y', float, (npts,)), ('z', float, (npts,)), ('cp', float, (npts,))])
+    for name in ('x', 'y', 'z', 'cp'): dist[name] = np.nan
+    for i, t in enumerate(tables):
+        n = len(t)
+        dist['npts'][i] = n
+        dist['x'][i, :n] = t[:, 0]
+        dist['y'][i, :n] = t[:, 1]
+        dist['z'][i, :n] = t[:, 2]
+        dist['cp'][i, :n] = t[:, 3]
+        
+    return dist
+
+
+def agps_index(filename, save = True):
+    """Build the byte-offset index of the blocks in an agps file
+
+    The index records, for each network/column block, the byte offset of
+    the first line after the block header and of the '*eof' marker. It is
+    saved next to the file (filename + '.index.npy', see sidecar.load) and
+    reused while the agps file is unchanged.
+
+    Inputs:
+        filename = Name of the agps file
+        save = Save the index next to the file? (True/False)
+
+    Returns a NumPy structured array with the fields network, column, start
+    and stop.
+    """
+    return sidecar.load(filename, _agps_index, '.index.npy', save)
+
+
+def _agps_index(filename):
+    """Scan an agps file for its block offsets (see agps_index)
+    """
+    entries = []
+    network = None
+    offset = 0
+    with open(filename, 'rb') as resfile:
+        for n, line in enumerate(resfile):
+            if n >= 6:  # Skip the file header
+                if network is None:
+                    if _AGPS_HEADER_BYTES.match(line) is not None:
+                        network = int(line[1:3])
+                        column = int(line[4:7])
+                        start = offset + len(line)
+                elif _AGPS_EOF_BYTES.match(line) is not None:
+                    entries.append((network, column, start, offset))
+                    network = None
+                    
+            offset += len(line)
+
+    index = np.array(entries, dtype = [('network', int), ('column', int),
+            ('start', np.int64), ('stop', np.int64)])
+
+    return index
+
+
+def agps_indexed_blocks(filename, networks = None, columns = None):
+    """Read selected blocks of an agps file using its byte-offset index
+
+    Only the requested blocks of the memory-mapped file are decoded, so
+    reading a few columns does not depend on the size of the file.
+
+    Inputs:
+        filename = Name of the agps file
+        networks = Networks to read (None = all networks)
+        columns = Columns to read (None = all columns)
+
+    Yields (network, column, lines) for each block, as agps_blocks.
+    """
+    index = agps_index(filename)
+    mask = np.ones(len(index), dtype = bool)
+    if networks is not None: mask &= np.isin(index['network'], networks)
+    if columns is not None: mask &= np.isin(index['column'], columns)
+    if not np.any(mask): return
+
+    with open(filename, 'rb') as resfile:
+        with mmap.mmap(resfile.fileno(), 0, access = mmap.ACCESS_READ) as data:
+            for entry in index[mask]:
+                lines = data[entry['start']:entry['stop']].decode().splitlines(True)
+                yield (int(entry['network']), int(entry['column']),
+                        [line for line in lines if _AGPS_COLUMNS.match(line) is None])
+
+
+def read_agps(filename, symm = True, columns = None):
+    """Read the section distributions of the wing from a Panair agps file
+
+    Inputs:
+        filename = Name of the agps file
+        symm = Is only the right semispan modeled? (True/False)
+        columns = Network columns (sections, starting at 1) to read. If None,
+                the whole file is streamed; otherwise only these columns are
+                read through the byte-offset index (see agps_index), and for
+                full wings the left-wing columns are followed by the
+                right-wing columns.
+
+    Returns a NumPy structured array (see agps_distributions).
+    """
+    if columns is not None:
+        blocks = agps_indexed_blocks(filename, (1, 2, 4, 5), columns)
+        return agps_distributions(((network, column, agps_table(lines))
+                for network, column, lines in blocks), symm, join = False)
+
+    with open(filename, 'r') as resfile:
+        return agps_distributions(((network, column, agps_table(lines))
+                for network, column, lines in agps_blocks(resfile)), symm)
+
+
 def integrate(f, x):
     """Integrate a function over a variable using the trapezoidal rule
     
     f = List/array of function values
     x = List/array of corresponding independent variable values
     """
-    int_f = 0.0
-    for f1, f2, x1, x2 in zip(f[:-1], f[1:], x[:-1], x[1:]):
-        int_f += 0.5 * (f1 + f2) * (x2 - x1)
-        
-    return int_f
+    return section_kernels.trapezoid(f, x)
     
     
 def interpolate(x1, x2, f1, f2, x):
     """Interpolate a function to a given x
     """
-    try:
-        return (x - x1) / (x2 - x1) * (f2 - f1) + f1
-    except:
-        print("Could not interpolate between {} and {}".format(x1, x2))
-        return None
\ No newline at end of file
+    return section_kernels.interpolate(x1, x2, f1, f2, x)
@@ -0,0 +1,455 @@
+import numpy as np
+import os
+import copy
+import json
+import tempfile
+from collections import OrderedDict
+
+import phd_scripts
+from phd_scripts.utility_scripts import job_directory
+
+
+class PanairDeck(object):
+    """Generates Panair input decks directly from a Wing and an airfoil profile
+
+    This class builds the Panair networks for a straight, unswept wing with a
+    uniform cross-section: the upper and lower wing surfaces, a trailing wake
+    from the trailing edge, and an end cap closing each wing tip. The networks
+    are written in the same order used by the MachUp Panair export, so the
+    resulting agps file can be read by panair.Panair:
+
+        Symmetric wing:  1 = upper, 2 = lower, 3 = wake, 4 = tip cap
+        Full wing:       1-3 = right wing, 4-6 = left wing, 7-8 = tip caps
+
+    Each wing surface network has one column per spanwise section endpoint
+    (wing.y) and one row per profile point, so the columns of the upper and
+    lower networks together form a closed section from the trailing edge,
+    over the upper surface to the leading edge and back along the lower
+    surface. The quarter chord lies on the y-axis.
+    """
+    def __init__(self, airfoil, wing, template = 'input.json', templatedir = None,
+            jobdir = None):
+        """Constructor
+
+        Inputs
+        ------
+        airfoil:        Airfoil object with a profile in its airfoil database
+        wing:           Wing object
+        template:       MachUp template file providing alpha and end cap settings
+        templatedir:    Directory containing the template file
+        jobdir:         Directory for the generated deck (None = self.name)
+        """
+        self.airfoil = airfoil
+        self.wing = wing
+
+        self.template = template
+        self.templatedir = templatedir if templatedir is not None else (
+                phd_scripts.__path__[0] + os.sep + 'templates')
+
+        self.jobdir = jobdir if jobdir is not None else self.name
+
+        # The following parameters override the values in the template file
+        # if they are not None
+        self.alpha = None
+        self.endcap_npts = None
+        self.endcap_scale = None
+
+
+    @property
+    def name(self):
+        return "deck_{}_{}".format(self.airfoil.name, self.wing.name)
+
+
+    @property
+    def panair_input_file(self):
+        return self.jobdir + os.sep + 'input_view.panair'
+
+
+    def setup(self, overwrite = None):
+        """Generate the Panair input deck for this wing
+        """
+        # Make sure the airfoil exists in the database
+        error = self.airfoil.create_airfoil()
+        if error: return None
+
+        # Read the flight condition and end cap settings from the template
+        template = self.templatedir + os.sep + self.template
+        if not os.path.isfile(template):
+            print("Error: Input template file '{}' does not exist.".format(template))
+            return None
+
+        with open(template, 'r') as inp_orig:
+            input_data = json.load(inp_orig, object_pairs_hook = OrderedDict)
+
+        if self.alpha is None: self.alpha = input_data['condition']['alpha']
+        panair_data = input_data['run']['panair']
+        if self.endcap_npts is None: self.endcap_npts = int(panair_data['endcap_npts'])
+        if self.endcap_scale is None: self.endcap_scale = panair_data['endcap_scale']
+
+        return job_directory.create(self.jobdir, overwrite,
+                lambda jobdir: self.write(jobdir + os.sep + 'input_view.panair'))
+
+
+    def profile(self):
+        """Read the airfoil profile and split it into upper and lower surfaces
+
+        The profile file holds the number of points on its first line (the
+        format written by Joukowski.exe), followed by one x/c, z/c pair per
+        line. Repeated consecutive points (e.g. the two leading-edge points
+        of a flat plate) are used once, so no panel has zero length. The
+        profile is split at its middle point. If there is no middle point
+        (an even number of points, as written by Joukowski.exe), the two
+        surfaces are closed at the midpoint of the two points straddling
+        the leading edge, so both surfaces have the same number of points.
+
+        Returns the upper surface (trailing edge to leading edge) and the lower
+        surface (leading edge to trailing edge) as (n, 2) arrays of x/c, z/c.
+        """
+        filename = self.airfoil.dbdir + os.sep + self.airfoil.name + '_profile.txt'
+        with open(filename, 'r') as profile:
+            lines = profile.read().splitlines()
+        if len(lines[0].split()) == 1: lines = lines[1:]
+        xz = np.loadtxt(lines, ndmin = 2)
+        xz = xz[np.concatenate([[True], np.any(np.diff(xz, axis = 0) != 0.0, axis = 1)])]
+        n = len(xz)
+        if n % 2 == 0:
+            xz = np.insert(xz, n // 2, 0.5 * (xz[n // 2 - 1] + xz[n // 2]), axis = 0)
+        le = len(xz) // 2
+        return (xz[:le + 1], xz[le:])
+
+
+    def semispan(self):
+        """Get the spanwise section endpoints and chords of the right semispan
+        """
+        w = copy.copy(self.wing)
+        w.symm = True
+        w.create_sections()
+        return (w.y, w.c)
+
+
+    def networks(self):
+        """Build the Panair networks for this wing
+
+        Returns a list of dictionaries with the keys 'name', 'kt' and either
+        'points' ((columns, rows, 3) array) or, for trailing wakes, 'inat',
+        'insd' and 'xwake'.
+        """
+        upper, lower = self.profile()
+        y, c = self.semispan()
+
+        # Wing surface grids (vectorized over columns and rows)
+        def surface(xz, y, c):
+            points = np.zeros((len(y), len(xz), 3))
+            points[:, :, 0] = c[:, None] * (xz[None, :, 0] - 0.25)
+            points[:, :, 1] = y[:, None]
+            points[:, :, 2] = c[:, None] * xz[None, :, 1]
+            return points
+
+        xwake = 100.0 * max(self.wing.b, np.max(c))
+        right = [
+            {'name': 'wingup', 'kt': 1, 'points': surface(upper, y, c)},
+            {'name': 'winglo', 'kt': 1, 'points': surface(lower, y, c)},
+            {'name': 'wake', 'kt': 18, 'inat': 'wingup', 'insd': 4, 'xwake': xwake}]
+        networks = list(right)
+        caps = [{'name': 'tipcap', 'kt': 1, 'points': self.endcap(right[0]['points'][-1],
+                right[1]['points'][-1], 1.0)}]
+
+        if not self.wing.symm:
+            # Mirror the right wing, reversing the columns (tip to root) to
+            # keep the surface normals pointing outward
+            mirror = np.array([1.0, -1.0, 1.0])
+            networks += [
+                {'name': 'lwingup', 'kt': 1, 'points': right[0]['points'][::-1] * mirror},
+                {'name': 'lwinglo', 'kt': 1, 'points': right[1]['points'][::-1] * mirror},
+                {'name': 'lwake', 'kt': 18, 'inat': 'lwingup', 'insd': 4, 'xwake': xwake}]
+            caps.append({'name': 'ltipcap', 'kt': 1, 'points': self.endcap(
+                    networks[3]['points'][0], networks[4]['points'][0], -1.0)})
+
+        # Pointed tips (e.g. elliptic wings) do not need an end cap
+        if c[-1] > 0.0: networks += caps
+
+        return networks
+
+
+    def endcap(self, upper, lower, side):
+        """Build an end cap network closing a wing tip
+
+        The cap has endcap_npts columns running from the upper surface around
+        the tip to the lower surface. Its outboard extent at each chordwise
+        station is endcap_scale times the local half-thickness.
+
+        Inputs:
+            upper = (n, 3) array of upper-surface tip points (trailing edge to leading edge)
+            lower = (n, 3) array of lower-surface tip points (leading edge to trailing edge)
+            side = +1.0 for a right wing tip, -1.0 for a left wing tip
+        """
+        lower = lower[::-1]
+        camber = 0.5 * (upper[:, 2] + lower[:, 2])
+        half = 0.5 * (upper[:, 2] - lower[:, 2])
+        psi = np.linspace(0.0, np.pi, self.endcap_npts)[:, None]
+
+        points = np.zeros((len(psi), len(upper), 3))
+        points[:, :, 0] = 0.5 * (upper[:, 0] + lower[:, 0])
+        points[:, :, 1] = upper[:, 1] + side * self.endcap_scale * half * np.sin(psi)
+        points[:, :, 2] = camber + half * np.cos(psi)
+        if side < 0.0: points = points[::-1]
+
+        return points
+
+
+    def header(self):
+        """Get the records preceding the networks in the Panair input deck
+        """
+        w = self.wing
+        lines = []
+        lines += ['$title', 'panair deck generated for {}'.format(self.name)]
+        lines += ['$datacheck', '=datacheck', _fields([0.0])]
+        lines += ['$symmetry - xz plane of symmetry', '=misymm   mjsymm',
+                _fields([1.0 if w.symm else 0.0, 0.0])]
+        lines += ['$mach number', '=amach', _fields([0.0])]
+        lines += ['$cases - no. of solutions', '=nacase', _fields([1.0])]
+        lines += ['$angles-of-attack', '=alpc', _fields([self.alpha]),
+                '=alpha(1)', _fields([self.alpha])]
+        lines += ['$printout options',
+                '=isings   igeomp    isingp    icontp    ibconp    iedgep',
+                _fields([0.0, 0.0, 0.0, 0.0, 0.0, 0.0]),
+                '=ipraic   nexdgn    ioutpr    ifmcpr',
+                _fields([0.0, 0.0, 1.0, 0.0])]
+        lines += ['$references for accumulated forces and moments',
+                '=xref     yref      zref      nref',
+                _fields([0.0, 0.0, 0.0, 0.0]),
+                '=sref     bref      cref      dref',
+                _fields([w.Area, w.b, w.c_avg, w.b])]
+
+        return {'cards': lines}
+
+
+    def write(self, filename):
+        """Write the Panair input deck
+        """
+        records = [self.header()] + self.networks() + [{'cards': ['$end of input data']}]
+        write_deck(filename, records)
+
+
+def read_deck(filename):
+    """Read a Panair input deck
+
+    Returns a list of records in the order they appear in the deck. Each
+    network is returned as a dictionary in the format used by
+    PanairDeck.networks ('name', 'kt' and 'points' for networks given by
+    points, or 'name', 'kt', 'inat', 'insd' and 'xwake' for trailing wakes).
+    All other records are returned unchanged as {'cards': [lines]}.
+
+    Inputs:
+        filename = Name of the Panair input file
+    """
+    with open(filename, 'r') as deck:
+        lines = deck.read().splitlines()
+
+    # Split the deck into records (each starting with a '$' card)
+    records = []
+    for line in lines:
+        if line.startswith('$') or len(records) == 0: records.append([])
+        records[-1].append(line)
+
+    result = []
+    for record in records:
+        keyword = record[0].lower()
+        cards = [line for line in record[1:] if not line.startswith('=')]
+        if keyword.startswith('$points'):
+            kn = int(_values(cards[0])[0])
+            k = 1
+            for n in range(kn):
+                kt = int(_values(cards[k])[0])
+                nm, nn = [int(value) for value in _values(cards[k + 1][:20])]
+                name = cards[k + 1][70:].strip() or 'network'
+                nlines = (nm * nn + 1) // 2
+                values = np.concatenate([_values(card) for card in cards[k + 2:k + 2 + nlines]])
+                points = values[:3 * nm * nn].reshape((nn, nm, 3))
+                result.append({'name': name, 'kt': kt, 'points': points})
+                k += 2 + nlines
+
+        elif keyword.startswith('$trailing'):
+            kn = int(_values(cards[0])[0])
+            kt = int(_values(cards[1])[0])
+            for card in cards[2:2 + kn]:
+                values = _values(card[10:40])
+                result.append({'name': card[70:].strip() or 'wake', 'kt': kt,
+                        'inat': card[:10].strip(), 'insd': int(values[0]),
+                        'xwake': values[1]})
+
+        else:
+            result.append({'cards': record})
+
+    return result
+
+
+def write_deck(filename, records):
+    """Write a Panair input deck
+
+    Inputs:
+        filename = Name of the Panair input file
+        records = List of records in the format returned by read_deck
+    """
+    lines = []
+    for record in records:
+        if 'cards' in record:
+            lines += record['cards']
+
+        elif record['kt'] == 18:
+            lines += ['$trailing wakes - {}'.format(record['name']), '=kn',
+                    _fields([1.0]), '=kt       matcw', _fields([18.0, 0.0]),
+                    '=inat     insd      xwake     twake' + ' ' * 35 + 'netname',
+                    '{:<10s}'.format(record['inat']) +
+                    _fields([record['insd'], record['xwake'], 0.0]) +
+                    ' ' * 30 + record['name']]
+
+        else:
+            points = record['points']
+            lines += ['$points - {}'.format(record['name']), '=kn', _fields([1.0]),
+                    '=kt', _fields([float(record['kt'])]),
+                    '=nm       nn' + ' ' * 58 + 'netname',
+                    _fields([points.shape[1], points.shape[0]]) + ' ' * 50 +
+                    record['name'],
+                    '=x(1,1)   y(1,1)    z(1,1)    x(*,*)    y(*,*)    z(*,*)']
+            flat = points.ravel()
+            lines += [_fields(flat[i:i + 6]) for i in range(0, len(flat), 6)]
+
+    # Replace any existing file in one step, so concurrent readers never see
+    # a partly written deck
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp = tempfile.mkstemp(dir = directory)
+    with os.fdopen(fd, 'w') as deck:
+        deck.write('\n'.join(lines) + '\n')
+    os.replace(tmp, filename)
+
+
+def rescale_thickness(records, ratio):
+    """Scale the thickness of every wing section in a Panair input deck
+
+    The wing surfaces are expected in the network order written by
+    PanairDeck (an upper and a lower surface network followed by their
+    trailing wake, once per wing, then the tip caps). Each point is moved
+    toward or away from the local camber line,
+
+        z_new = z_c + ratio (z - z_c)
+
+    where the camber z_c is found by interpolating the opposite surface at
+    the same chordwise location. Tip caps are scaled about their own camber
+    line and their outboard extent is scaled by the same ratio. All arrays
+    are processed at once, so the spanwise and chordwise grids are unchanged.
+
+    Note that scaling the thickness of a Joukowski airfoil does not give
+    exactly the Joukowski airfoil of the new thickness, although the two
+    agree to within O(t^2) of the section shape.
+
+    Inputs:
+        records = List of records returned by read_deck or PanairDeck.networks
+        ratio = New thickness divided by the current thickness
+    """
+    records = copy.deepcopy(records)
+    networks = [r for r in records if 'points' in r]
+    wakes = [r for r in records if r.get('kt') == 18]
+    surfaces = networks[:2 * len(wakes)]
+    caps = networks[2 * len(wakes):]
+
+    for upper, lower in zip(surfaces[0::2], surfaces[1::2]):
+        pu = upper['points']
+        pl = lower['points']
+        camber_u = 0.5 * (pu[..., 2] + _interp_columns(pu[..., 0], pl[..., 0], pl[..., 2]))
+        camber_l = 0.5 * (pl[..., 2] + _interp_columns(pl[..., 0], pu[..., 0], pu[..., 2]))
+        pu[..., 2] = camber_u + ratio * (pu[..., 2] - camber_u)
+        pl[..., 2] = camber_l + ratio * (pl[..., 2] - camber_l)
+
+    for cap in caps:
+        p = cap['points']
+        camber = 0.5 * (p[0, :, 2] + p[-1, :, 2])
+        tip = p[0, :, 1]
+        p[..., 2] = camber + ratio * (p[..., 2] - camber)
+        p[..., 1] = tip + ratio * (p[..., 1] - tip)
+
+    return records
+
+
+def thickness_variant(base_file, filename, ratio, overwrite = None):
+    """Write a copy of a Panair input deck with the section thickness scaled
+
+    An existing file is kept unless overwrite is True or base_file has been
+    modified since the file was written (e.g. the base deck was generated
+    again), in which case it is replaced.
+
+    Inputs:
+        base_file = Name of the existing Panair input file
+        filename = Name of the new Panair input file
+        ratio = New thickness divided by the thickness in base_file
+        overwrite = Overwrite an existing file? (True/False)
+
+    Returns True if the file was written.
+    """
+    if (os.path.isfile(filename) and not overwrite and
+            os.stat(filename).st_mtime_ns >= os.stat(base_file).st_mtime_ns):
+        return False
+
+    directory = os.path.dirname(filename)
+    if directory and not os.path.isdir(directory): os.makedirs(directory)
+    write_deck(filename, rescale_thickness(read_deck(base_file), ratio))
+    return True
+
+
+def _interp_columns(x, xp, fp):
+    """Interpolate each column of fp(xp) at the points x
+
+    Inputs:
+        x = (columns, n) array of points to interpolate at
+        xp = (columns, m) array of data points
+        fp = (columns, m) array of data values
+    """
+    order = np.argsort(xp, axis = -1)
+    xp = np.take_along_axis(xp, order, axis = -1)
+    fp = np.take_along_axis(fp, order, axis = -1)
+
+    # Locate each point on its own column, then interpolate linearly
+    i = np.clip(np.sum(xp[:, None, :] <= x[:, :, None], axis = -1), 1, xp.shape[-1] - 1)
+    x0 = np.take_along_axis(xp, i - 1, axis = -1)
+    x1 = np.take_along_axis(xp, i, axis = -1)
+    f0 = np.take_along_axis(fp, i - 1, axis = -1)
+    f1 = np.take_along_axis(fp, i, axis = -1)
+    dx = np.where(x1 > x0, x1 - x0, 1.0)
+    return f0 + (f1 - f0) * np.clip((x - x0) / dx, 0.0, 1.0)
+
+
+def _values(card):
+    """Read the numbers in the 10-character fields of a Panair input card
+    """
+    card = card[:60].rstrip()
+    return np.array([float(card[i:i + 10]) for i in range(0, len(card), 10)
+            if card[i:i + 10].strip()])
+
+
+def _field(value):
+    """Format a number in a 10-character Panair input field
+
+    At most nine characters are used, so consecutive fields are always
+    separated by at least one space. Of the fixed-point and exponent forms
+    that fit, the one closest to the value is used, so that small
+    coordinates keep their significant digits.
+    """
+    value = float(value) + 0.0
+    if value == int(value) and abs(value) < 1.0e8:
+        return '{:<10s}'.format('{:d}.'.format(int(value)))
+
+    candidates = []
+    for digits in range(7, -1, -1):
+        candidates.append('{:#.{}f}'.format(value, digits))
+        mantissa, exponent = '{:#.{}E}'.format(value, digits).split('E')
+        candidates.append('{}E{:d}'.format(mantissa, int(exponent)))
+
+    s = min((s for s in candidates if len(s) <= 9),
+            key = lambda s: abs(float(s) - value))
+    return '{:<10s}'.format(s)
+
+
+def _fields(values):
+    """Format a list of numbers as consecutive 10-character Panair input fields
+    """
+    return ''.join(_field(value) for value in values)
@@ -2,7 +2,12 @@ from phd_scripts.utility_scripts import airfoil
 from phd_scripts.utility_scripts import wing
 from phd_scripts.utility_scripts import machup
 from phd_scripts.utility_scripts import panair
+from phd_scripts.utility_scripts import panair_deck
+from phd_scripts.utility_scripts import executor
+from phd_scripts.utility_scripts import result_cache
+from phd_scripts.utility_scripts import results_db
 from phd_scripts.utility_scripts import richardson_extrapolation
+from phd_scripts.utility_scripts import joint_extrapolation
 
 import numpy as np
 import matplotlib.pyplot as plt
@@ -16,7 +21,8 @@ plt.rcParams["lines.markersize"] = 4
 
             
 def sec_cl(c, RA, RT = None, root_clustering = False, tip_clustering = True,
-        viz = False, npts = [20, 40, 80], ts = [0.16, 0.08, 0.04]):
+        viz = False, npts = [20, 40, 80], ts = [0.16, 0.08, 0.04], deck = 'machup',
+        rescale = False, quadrature = 'trapezoid', design = 'full', airfoil_backend = 'exe'):
     """Calculate the wing lift slope of a finite wing using Panair
     
     This function calculates the wing lift slope of a finite wing using
@@ -24,6 +30,7 @@ def sec_cl(c, RA, RT = None, root_clustering = False, tip_clustering = True,
     panel code is solved nine times, using three different grid sizes and
     three different airfoil thicknesses. The results are extrapolated using
     Richardson Extrapolation to approximate a thin airfoil on a refined grid.
+    The MachUp and Panair jobs are run concurrently (see executor.run).
     
     Inputs:
         c = Average chord length
@@ -32,8 +39,23 @@ def sec_cl(c, RA, RT = None, root_clustering = False, tip_clustering = True,
         root_clustering = Use cosine-clustering at the root? (True/False)
         tip_clustering = Use cosine-clustering at the tip? (True/False)
         viz = Visualize the spanwise lift coefficient? True/False
-        npts = Number of spanwise and chordwise sections
+        npts = Number of spanwise and chordwise sections of each grid, from
+                coarse to fine (two or more grids, see panair.extrapolate_CL)
         ts = Thicknesses (fraction of chord)
+        deck = Panair input deck generator ('machup' = MachUp.exe, 'python' =
+                panair_deck.PanairDeck)
+        rescale = Derive the decks for ts[1:] by scaling the thickness of the
+                ts[0] deck on the same grid? (True/False)
+        quadrature = Chordwise pressure integration rule (see
+                section_kernels.QUADRATURES). Higher-order rules allow coarser
+                chordwise grids.
+        design = Runs used to extrapolate to zero grid spacing and thickness
+                ('full' = every grid for every thickness, extrapolated in
+                grid spacing and then in thickness; 'L', 'diagonal' or a list
+                of (grid level, thickness level) = fewer runs fitted jointly,
+                see joint_extrapolation)
+        airfoil_backend = Joukowski airfoil generator ('exe' = Joukowski.exe,
+                'python' = airfoil.create_airfoils, see airfoil.Joukowski)
     """
     # Calculate the wingspan
     if RA == 'Circular': b = 4.0 / np.pi * c
@@ -42,13 +64,27 @@ def sec_cl(c, RA, RT = None, root_clustering = False, tip_clustering = True,
     # Define a set of markers to use for plotting
     markers = ['o', 's', '^']
     
-    # Initialize lists for 
-    ys = []
-    cls = []
-    for t in ts:
-        res = []
-        for npt in npts:
-            a = airfoil.Joukowski(t, 0.0, npt)
+    # Generate the Panair input decks, running the MachUp jobs concurrently.
+    # Jobs whose results are already in the result cache are not rerun.
+    cache = result_cache.default_cache
+    if design == 'full': points = None
+    else: points = joint_extrapolation.design_points(design)
+    cases = {}
+    base_files = {}
+    machup_jobs = []
+
+    # The Python generator creates the airfoils of every run together (see
+    # airfoil.create_airfoils); Joukowski.exe airfoils are created by the
+    # setup of the jobs that use them. Errors are reported by those setups.
+    airfoils = {(i, j): airfoil.Joukowski(t, 0.0, npt, backend = airfoil_backend)
+            for j, t in enumerate(ts) for i, npt in enumerate(npts)
+            if points is None or (i, j) in points}
+    if airfoil_backend == 'python': airfoil.create_airfoils(list(airfoils.values()))
+
+    for j, t in enumerate(ts):
+        for i, npt in enumerate(npts):
+            if (i, j) not in airfoils: continue
+            a = airfoils[(i, j)]
             
             if RT is None:
                 w = wing.Elliptic(RA, b, npt, symm=True, suffix=None,
@@ -63,18 +99,56 @@ def sec_cl(c, RA, RT = None, root_clustering = False, tip_clustering = True,
                         root_clustering = root_clustering,
                         tip_clustering = tip_clustering)
             
-            m = machup.MachUp(a, w)
-            if(m.setup(overwrite = False)):
-                m.execute()
+            if rescale and npt in base_files:
+                # Derived from the first deck for this grid below
+                input_file = panair_deck.PanairDeck(a, w).panair_input_file
+            elif deck == 'python':
+                m = panair_deck.PanairDeck(a, w)
+                m.setup(overwrite = False)
+                input_file = m.panair_input_file
+                base_files[npt] = (input_file, t)
+            else:
+                m = machup.MachUp(a, w)
+                if(not cache.lookup(m) and m.setup(overwrite = False)):
+                    machup_jobs.append(m)
+                input_file = m.panair_input_file
+                base_files[npt] = (input_file, t)
+                
+            cases[(t, npt)] = (a, w, input_file)
+            
+    executor.run(machup_jobs, cache = cache, db = results_db.default_db)
+    
+    # Run the Panair analyses concurrently
+    panair_jobs = []
+    for (t, npt), (a, w, input_file) in cases.items():
+        base_file, base_t = base_files[npt]
+        if input_file != base_file:
+            # Scale the thickness of the first deck for this grid
+            panair_deck.thickness_variant(base_file, input_file,
+                    t / base_t, overwrite = False)
         
-            p = panair.Panair(a, w, m.panair_input_file)
-            if(p.setup(overwrite = False)):
-                p.execute()
+        p = panair.Panair(a, w, input_file)
+        p.quadrature = quadrature
+        p.options = {'generator': deck, 'rescaled': input_file != base_file}
+        if(not cache.lookup(p) and p.setup(overwrite = False)):
+            panair_jobs.append(p)
             
-            res.append(p)
+        cases[(t, npt)] = p
+        
+    executor.run(panair_jobs, cache = cache, db = results_db.default_db)
+    
+    if points is not None:
+        return _joint_sec_cl(cases, b, npts, ts, points,
+                joint_extrapolation.design_terms(design), viz)
+    
+    # Initialize lists for 
+    ys = []
+    cls = []
+    for t in ts:
+        res = [cases[(t, npt)] for npt in npts]
             
         # Extrapolate grid-refinement results to a mesh of infinite panal count
-        (y_ext, cl_ext) = panair.extrapolate_CL(res[0], res[1], res[2])
+        (y_ext, cl_ext) = panair.extrapolate_CL(*res)
         
         # Plot the extrapolated lift distribution
         if viz:
@@ -131,15 +205,53 @@ def sec_cl(c, RA, RT = None, root_clustering = False, tip_clustering = True,
         plt.show()
 
     return (ys[0], cl_ext, res[0].sec_c)
+
+
+def _joint_sec_cl(cases, b, npts, ts, points, terms, viz = False):
+    """Extrapolate the Panair runs of a sparse design (see sec_cl)
+
+    The section lift coefficients of every run are averaged onto the
+    sections of the coarsest grid (see wing.Wing.restriction) and
+    extrapolated to zero grid spacing and zero thickness together (see
+    joint_extrapolation.extrapolate).
+    """
+    runs = [cases[(ts[j], npts[i])] for i, j in points]
+    coarse = min(runs, key = lambda p: p.wing.nSec)
+    cls = [p.wing.restriction(coarse.wing) @ p.sec_CL for p in runs]
+    (cl_ext, error) = joint_extrapolation.extrapolate(
+            [npts[0] / npts[i] for i, j in points], [ts[j] / ts[0] for i, j in points],
+            cls, terms)
+    y_ext = coarse.sec_y
+
+    if viz:
+        plt.figure(figsize = (4.0, 2.5))
+        for (i, j), cl in zip(points, cls):
+            plt.plot(y_ext / b, cl, label='{0} x {0}, t = {1:.0F}%'.format(npts[i], 100 * ts[j]),
+                    color='k', linestyle=(0, ()), linewidth=0.5)
+        plt.errorbar(y_ext / b, cl_ext, yerr = error, label='Extrapolated', color='k',
+                linestyle=(0, ()), marker='x', fillstyle='none')
+                
+        plt.xlabel(r'$y/b$')
+        plt.ylabel(r'$c_l$')
+        plt.xlim(0.0, 0.5)
+        plt.ylim(0.0, 1.1 * max(max(cl) for cl in cls + [cl_ext]))
+        plt.legend(loc = 'lower left', prop={'size': 6}, ncol = 2,
+                framealpha = 1.0, numpoints = 1)
+        plt.tight_layout()
+        plt.show()
+
+    return (y_ext / b, cl_ext, coarse.sec_c)
     
     
 def cla(c, RA, RT = None, root_clustering = False, tip_clustering = True,
-        viz = False, npts = [20, 40, 80], ts = [0.16, 0.08, 0.04]):
+        viz = False, npts = [20, 40, 80], ts = [0.16, 0.08, 0.04], deck = 'machup',
+        rescale = False, quadrature = 'trapezoid', design = 'full', airfoil_backend = 'exe'):
     if RA == 'Circular': b = 4.0 / np.pi * c
     else: b = RA * c
 
     # Calculate the section lift distribution
-    yb, cl_ext, c = sec_cl(c, RA, RT, root_clustering, tip_clustering, viz, npts, ts)
+    yb, cl_ext, c = sec_cl(c, RA, RT, root_clustering, tip_clustering, viz, npts, ts, deck,
+            rescale, quadrature, design, airfoil_backend)
             
     # Calculate the total lift coefficient and the wing lift slope
     if RT is None:
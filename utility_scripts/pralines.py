@@ -1,16 +1,20 @@
 import numpy as np
 import os
-import shutil
-import time
+import subprocess
 
 import phd_scripts
 from phd_scripts.utility_scripts import airfoil
 from phd_scripts.utility_scripts import wing
+from phd_scripts.utility_scripts import job_directory
+from phd_scripts.utility_scripts import result_cache
 
 
 class Pralines(object):
     """Wrapper class for creating, running, and post-processing Pralines lifting line analyses
     """
+    # Files stored by result_cache.ResultCache
+    result_files = ['output.txt', 'liftcoefficient.dat']
+    
     def __init__(self, wing, a0, larc, cmd = 'PrandtlsLiftingLine.exe',
             cmddir = None, jobdir = None):
         """Constructor
@@ -36,10 +40,18 @@ class Pralines(object):
     def setup(self, overwrite = None):
         """Generate a Pralines input file specific for this wing
         """
-        # Create the job directory
-        created = self.create_job_directory(overwrite)
-        if not created: return False
+        # Create the job directory containing the new input file
+        rendered = self.render()
+        def populate(jobdir):
+            with open(jobdir + os.sep + 'input.txt', 'w') as inp_new:
+                inp_new.write(rendered)
+
+        return self.create_job_directory(overwrite, populate, self.cache_key(rendered))
+        
         
+    def render(self):
+        """Generate the list of Pralines commands for this wing
+        """
         # Generate list of commands
         lines = []
         
@@ -104,25 +116,27 @@ class Pralines(object):
         # Quit
         lines.append('Q')
         
-        # Create the new input file in the job directory
-        with open(self.jobdir + os.sep + 'input.txt', 'w') as inp_new:
-            inp_new.write('\n'.join([str(line) for line in lines]))
-
-        return True
+        return '\n'.join([str(line) for line in lines])
+        
+        
+    def cache_key(self, rendered = None):
+        """Get the result cache key of this job (see result_cache.key)
+        """
+        if rendered is None: rendered = self.render()
+        return result_cache.key(rendered, self.cmddir + os.sep + self.cmd)
         
         
     def execute(self):
-        # Move into the job directory
-        cwd = os.getcwd()
-        os.chdir(self.jobdir)
+        """Execute Pralines and return its return code
         
-        # Execute Pralines
+        Pralines is run with the job directory as its working directory,
+        without changing the working directory of this process.
+        """
+        jobdir = os.path.abspath(self.jobdir)
         cmd = self.cmddir + os.sep + self.cmd
         print(cmd)
-        os.system(cmd + " < input.txt")
-        
-        # Return to the original work directory
-        os.chdir(cwd)
+        with open(jobdir + os.sep + 'input.txt', 'r') as stdin:
+            return subprocess.call([cmd], stdin = stdin, cwd = jobdir)
         
         
     def sec_cl(self):
@@ -164,27 +178,9 @@ class Pralines(object):
             return float(lines[38].split()[2])
             
     
-    def create_job_directory(self, overwrite = None):
-        """Creates a directory for the Pralines analysis and copies necessary files
+    def create_job_directory(self, overwrite = None, populate = None, key = None):
+        """Creates a directory for the Pralines analysis (see job_directory.create)
         """
-        if os.path.isdir(self.jobdir):
-            if overwrite is None:
-                print("Directory already exists: " + self.jobdir)
-                ow = input("Do you want to overwrite? (Y/n)\n")
-                if len(ow) > 0 and (ow[0] == 'n' or ow[0] == 'N'):
-                    overwrite = False
-                else:
-                    overwrite = True
-                    
-            if overwrite:
-                shutil.rmtree(self.jobdir)
-                time.sleep(0.01) # Give the file system some time...
-            else:
-                return False
-    
-        # Set up the job directory and copy MachUp
-        os.mkdir(self.jobdir)
-        
-        return True
+        return job_directory.create(self.jobdir, overwrite, populate, key)
         
         
@@ -1,11 +1,15 @@
 from phd_scripts.utility_scripts import pralines
+from phd_scripts.utility_scripts import lifting_line
 from phd_scripts.utility_scripts import wing
+from phd_scripts.utility_scripts import executor
+from phd_scripts.utility_scripts import result_cache
+from phd_scripts.utility_scripts import results_db
 from phd_scripts.utility_scripts import richardson_extrapolation
 
 import numpy as np
 
 
-def sec_cl(A, a0 = 2.0 * np.pi, RT = None, lowra = 'Classical'):
+def sec_cl(A, a0 = 2.0 * np.pi, RT = None, lowra = 'Classical', backend = 'exe'):
     """Calculate the wing lift slope of a wing using Pralines
     
     This function calculates the lift distribution of a finite wing using
@@ -18,6 +22,8 @@ def sec_cl(A, a0 = 2.0 * np.pi, RT = None, lowra = 'Classical'):
         a0 = Section lift slope
         RT = Taper ratio (ratio of tip chord to root chord) - None = Elliptic planform
         lowra = Low-aspect-ratio method ('Classical', 'Hodson', or 'ModifiedSlender')
+        backend = Solver to use ('exe' = PrandtlsLiftingLine.exe,
+                'python' = in-process lifting_line.LiftingLine)
     """
     # Define the grid discretization and airfoil thicknesses
     npts = 100
@@ -37,10 +43,17 @@ def sec_cl(A, a0 = 2.0 * np.pi, RT = None, lowra = 'Classical'):
     else:
         w = wing.Tapered(A, RT, b, npts, symm=True, suffix=None)
     
-    # Solve the problem using Pralines
-    pr = pralines.Pralines(w, a0, lowra)
-    if(pr.setup(overwrite = False)):
-        pr.execute()
+    # Solve the problem using Pralines, reusing results from the result cache
+    # and recording new results in the results database
+    if backend == 'python':
+        pr = lifting_line.LiftingLine(w, a0, lowra)
+        cache = None
+    else:
+        pr = pralines.Pralines(w, a0, lowra)
+        cache = result_cache.default_cache
+    if cache is None or not cache.lookup(pr):
+        if(pr.setup(overwrite = False)):
+            executor.run([pr], cache = cache, db = results_db.default_db)
         
     wing_cl = pr.WingLiftCoefficient
     ys, cls = pr.sec_cl()
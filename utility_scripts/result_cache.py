@@ -0,0 +1,133 @@
+import os
+import shutil
+import hashlib
+import threading
+
+import phd_scripts
+from phd_scripts.utility_scripts import job_directory
+
+
+# Digests of executables, keyed on (path, size, modification time)
+_executables = {}
+_executables_lock = threading.Lock()
+
+
+def executable_identity(path):
+    """Get a digest identifying the contents of an executable
+
+    The digest is computed once for each version of the file. If the file
+    does not exist, its name is used instead.
+
+    Inputs:
+        path = Path to the executable
+    """
+    if not os.path.isfile(path): return os.path.basename(path)
+
+    stat = os.stat(path)
+    version = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _executables_lock:
+        if version not in _executables:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as exe:
+                for block in iter(lambda: exe.read(1 << 20), b''):
+                    digest.update(block)
+            _executables[version] = digest.hexdigest()
+
+        return _executables[version]
+
+
+def key(rendered, executable, inputs = ()):
+    """Create a content-addressed key for a solver job
+
+    Inputs:
+        rendered = Fully rendered input of the job (str or bytes)
+        executable = Path to the executable that runs the job
+        inputs = Paths to other files read by the job (e.g. airfoil database
+                entries referenced by name in the rendered input). Their
+                contents are part of the key; missing files are keyed by
+                their name.
+    """
+    if isinstance(rendered, str): rendered = rendered.encode('utf-8')
+    digest = hashlib.sha256()
+    digest.update(executable_identity(executable).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(rendered)
+    for path in inputs:
+        digest.update(b'\0' + os.path.basename(path).encode('utf-8') + b'\0')
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+class ResultCache(object):
+    """Content-addressed store of solver results
+
+    Results are stored under a key computed from the fully rendered input of
+    a job (see the render and cache_key methods of the wrappers) and the
+    identity of the executable, so a result is only reused when the job
+    would be exactly the same. Each entry is a directory holding the files
+    listed in the result_files attribute of the wrapper.
+    """
+    def __init__(self, cachedir = None):
+        """Constructor
+
+        Inputs
+        ------
+        cachedir:   Directory holding the cache entries (None = result_cache
+                    in the phd_scripts directory, whatever the working
+                    directory)
+        """
+        self.cachedir = cachedir
+        if self.cachedir is None:
+            self.cachedir = phd_scripts.__path__[0] + os.sep + 'result_cache'
+
+
+    def path(self, key):
+        """Get the directory of the entry for this key
+        """
+        return self.cachedir + os.sep + key[:2] + os.sep + key
+
+
+    def lookup(self, job):
+        """Point a wrapper object at its cached results, if available
+
+        If the results of this job are in the cache, the job directory of the
+        wrapper is set to the cache entry, so the results are parsed by the
+        usual properties (distributions, sec_CL, CL, ...) without setting up
+        or executing the job.
+
+        Inputs:
+            job = MachUp, Panair or Pralines object
+
+        Returns True if the results were found.
+        """
+        path = self.path(job.cache_key())
+        if not os.path.isdir(path): return False
+
+        job.jobdir = path
+        return True
+
+
+    def store(self, job):
+        """Copy the results of an executed job into the cache
+
+        Inputs:
+            job = MachUp, Panair or Pralines object
+
+        Returns True if a new entry was created.
+        """
+        files = [job.jobdir + os.sep + name for name in job.result_files]
+        if not all(os.path.isfile(f) for f in files):
+            print("Warning: results of '{}' are incomplete and were not cached".format(job.name))
+            return False
+
+        def populate(entry):
+            for f in files:
+                shutil.copyfile(f, entry + os.sep + os.path.basename(f))
+
+        return job_directory.create(self.path(job.cache_key()), 'reuse', populate)
+
+
+# Cache shared by the wrappers and sweeps
+default_cache = ResultCache()
@@ -0,0 +1,293 @@
+import numpy as np
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import closing
+
+import phd_scripts
+from phd_scripts.utility_scripts import wing as wing_module
+
+
+# Parameters stored for every run (name, SQL type)
+PARAMETERS = [
+    ('solver', 'TEXT'),
+    ('planform', 'TEXT'),
+    ('RA', 'REAL'),
+    ('RT', 'REAL'),
+    ('b', 'REAL'),
+    ('nSec', 'INTEGER'),
+    ('root_clustering', 'INTEGER'),
+    ('tip_clustering', 'INTEGER'),
+    ('symm', 'INTEGER'),
+    ('airfoil', 'TEXT'),
+    ('a0', 'REAL'),
+    ('larc', 'TEXT'),
+    ('options', 'TEXT'),
+]
+
+# Integrated results stored for every run (name, SQL type)
+RESULTS = [
+    ('CL', 'REAL'),
+    ('CL_alpha', 'REAL'),
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    {columns},
+    created REAL,
+    key TEXT
+);
+CREATE TABLE IF NOT EXISTS arrays (
+    run INTEGER REFERENCES runs(id) ON DELETE CASCADE,
+    name TEXT,
+    data BLOB,
+    PRIMARY KEY (run, name)
+);
+CREATE INDEX IF NOT EXISTS runs_method ON runs (solver, planform, larc, RA);
+CREATE INDEX IF NOT EXISTS runs_planform ON runs (planform, RT, RA);
+CREATE INDEX IF NOT EXISTS runs_airfoil ON runs (airfoil);
+CREATE UNIQUE INDEX IF NOT EXISTS runs_key ON runs (key);
+""".format(columns = ',\n    '.join('{} {}'.format(name, sqltype)
+        for name, sqltype in PARAMETERS + RESULTS))
+
+
+def describe(job):
+    """Extract the parameters, integrated results and spanwise arrays of a run
+
+    Inputs:
+        job = Executed MachUp, NumericalLiftingLine, Panair, Pralines or
+                LiftingLine object
+
+    The solver settings that are not wing or airfoil parameters are stored
+    as a JSON object in the 'options' parameter: the MachUp solver type
+    ('linear' or 'nonlinear'), and the chordwise quadrature and a digest of
+    the input deck of Panair runs. Any settings in an options dictionary
+    attribute of the job (e.g. the deck generator set by panair_wing_cla)
+    are added.
+
+    Returns (parameters, results, arrays), where arrays maps names to
+    float64 arrays: the spanwise coordinates 'y', the section lift
+    coefficients 'cl' and, where available, the section chords 'c'.
+    """
+    w = job.wing
+    if isinstance(w, wing_module.Rectangular): RT = 1.0
+    else: RT = getattr(w, 'RT', None)
+
+    params = {'solver': type(job).__name__.lower(), 'planform': type(w).__name__,
+            'RA': float(w.RA), 'RT': RT, 'b': float(w.b), 'nSec': int(w.nSec),
+            'root_clustering': int(bool(w.root_clustering)),
+            'tip_clustering': int(bool(w.tip_clustering)), 'symm': int(bool(w.symm)),
+            'airfoil': None, 'a0': None, 'larc': None}
+    results = {'CL': None, 'CL_alpha': None}
+    options = {}
+
+    if hasattr(job, 'WingLiftSlope'):
+        # Pralines and LiftingLine
+        params['a0'] = float(job.a0)
+        params['larc'] = job.larc
+        results['CL'] = float(job.WingLiftCoefficient)
+        results['CL_alpha'] = float(job.WingLiftSlope)
+        # sec_cl gives y/b and the ratio of section to wing lift coefficient
+        y, cl = job.sec_cl()
+        arrays = {'y': np.asarray(y) * w.b,
+                'cl': np.asarray(cl) * results['CL']}
+
+    elif hasattr(job, 'input_file'):
+        # Panair
+        params['airfoil'] = job.airfoil.name
+        options['quadrature'] = job.quadrature
+        options['deck'] = hashlib.sha256(job.render()).hexdigest()[:16]
+        results['CL'] = float(job.CL)
+        arrays = {'y': job.sec_y, 'cl': job.sec_CL, 'c': job.sec_c}
+
+    else:
+        # MachUp and NumericalLiftingLine
+        params['airfoil'] = job.airfoil.name
+        params['larc'] = job.lowra_method
+        rendered = json.loads(job.render())
+        alpha = rendered['condition']['alpha']
+        options['solver'] = rendered['solver']['type']
+        results['CL'] = float(job.CL)
+        results['CL_alpha'] = results['CL'] / np.radians(alpha)
+        arrays = {'y': job.sec_y, 'cl': job.sec_CL, 'c': job.sec_c}
+
+    options.update(getattr(job, 'options', {}))
+    params['options'] = json.dumps(options, sort_keys = True) if options else None
+
+    arrays = {k: np.ascontiguousarray(v, dtype = '<f8') for k, v in arrays.items()}
+    return (params, results, arrays)
+
+
+def key(parameters):
+    """Get the key identifying a run by its parameters (see PARAMETERS)
+
+    Missing parameters (None) are part of the key, so runs that differ only
+    in a missing value are still distinct.
+    """
+    return json.dumps([parameters[name] for name, sqltype in PARAMETERS])
+
+
+class ResultsDB(object):
+    """SQLite store of solver results
+
+    Each completed run is stored with the parameters of its wing, airfoil and
+    solver (see PARAMETERS), its integrated results (see RESULTS) and its
+    spanwise arrays, which are saved as little-endian float64 blobs. The
+    parameters are indexed, so sweeps can be read back with one query, e.g.
+
+        db.query(solver = 'pralines', larc = 'Hodson', RA = (0.1, 8.0))
+
+    A run is identified by its parameters (see key): recording a run again
+    replaces the earlier results.
+    """
+    def __init__(self, filename = None):
+        """Constructor
+
+        Inputs
+        ------
+        filename:   SQLite database file, created when it is first used
+                    (None = results.sqlite in the phd_scripts directory)
+        """
+        self.filename = filename
+        if self.filename is None:
+            self.filename = phd_scripts.__path__[0] + os.sep + 'results.sqlite'
+        self._lock = threading.Lock()
+        self._ready = False
+
+
+    def connect(self):
+        """Open a connection to the database, creating the tables if needed
+        """
+        conn = sqlite3.connect(self.filename, timeout = 60.0)
+        conn.execute('PRAGMA foreign_keys = ON')
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    _migrate(conn)
+                    conn.executescript(_SCHEMA)
+                    self._ready = True
+        return conn
+
+
+    def record(self, job, **params):
+        """Store the results of an executed job
+
+        Inputs:
+            job = Executed wrapper object (see describe)
+            params = Values that replace the parameters found by describe
+
+        Returns the id of the new run. An earlier run with the same
+        parameters (see key) is replaced, together with its arrays.
+        """
+        parameters, results, arrays = describe(job)
+        parameters.update(params)
+        values = dict(parameters, **results)
+        names = [name for name, sqltype in PARAMETERS + RESULTS]
+        run_key = key(parameters)
+
+        with closing(self.connect()) as conn, self._lock, conn:
+            conn.execute('DELETE FROM runs WHERE key = ?', (run_key,))
+            cursor = conn.execute('INSERT INTO runs (name, {}, created, key) '
+                    'VALUES (?, {}, ?, ?)'.format(', '.join(names), ', '.join('?' * len(names))),
+                    [job.name] + [values[name] for name in names] + [time.time(), run_key])
+            run = cursor.lastrowid
+            conn.executemany('INSERT INTO arrays (run, name, data) VALUES (?, ?, ?)',
+                    [(run, k, v.tobytes()) for k, v in arrays.items()])
+
+        return run
+
+
+    def query(self, columns = ('RA', 'CL_alpha'), order = 'RA', **params):
+        """Read the integrated results of the runs matching the given parameters
+
+        Inputs:
+            columns = Columns to return (see PARAMETERS and RESULTS, plus 'id' and
+                    'name')
+            order = Column used to sort the runs (None = unsorted)
+            params = Parameter values to match. A tuple (low, high) matches an
+                    inclusive range and None matches a missing value.
+
+        Returns a NumPy structured array with the requested columns.
+        """
+        types = dict(PARAMETERS + RESULTS, id = 'INTEGER', name = 'TEXT')
+        for name in list(columns) + ([] if order is None else [order]):
+            if name not in types:
+                raise ValueError("Unknown column '{}'".format(name))
+
+        where = []
+        args = []
+        for name, value in params.items():
+            if name not in types:
+                raise ValueError("Unknown parameter '{}'".format(name))
+            if value is None:
+                where.append('{} IS NULL'.format(name))
+            elif isinstance(value, tuple):
+                where.append('{} BETWEEN ? AND ?'.format(name))
+                args += [value[0], value[1]]
+            else:
+                where.append('{} = ?'.format(name))
+                args.append(value)
+
+        sql = 'SELECT {} FROM runs'.format(', '.join(columns))
+        if where: sql += ' WHERE ' + ' AND '.join(where)
+        if order is not None: sql += ' ORDER BY {}'.format(order)
+
+        with closing(self.connect()) as conn:
+            rows = conn.execute(sql, args).fetchall()
+
+        # Numeric columns are returned as floats, with NaN for missing values
+        dtype = [(name, object if types[name] == 'TEXT' else float) for name in columns]
+        rows = [tuple(np.nan if v is None and t is float else v for v, (n, t) in zip(row, dtype))
+                for row in rows]
+        return np.array(rows, dtype = dtype)
+
+
+    def arrays(self, run):
+        """Read the spanwise arrays of a run
+
+        Inputs:
+            run = Id of the run (see record and query)
+
+        Returns a dictionary of float64 arrays.
+        """
+        with closing(self.connect()) as conn:
+            rows = conn.execute('SELECT name, data FROM arrays WHERE run = ?',
+                    (run,)).fetchall()
+
+        return {name: np.frombuffer(data, dtype = '<f8') for name, data in rows}
+
+
+def _migrate(conn):
+    """Add the columns missing from a database created by an older version
+
+    The keys of all runs are then computed again. Runs recorded more than
+    once are reduced to the latest one, so the keys can be made unique (see
+    _SCHEMA).
+    """
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(runs)')]
+    missing = [(name, sqltype) for name, sqltype in PARAMETERS + RESULTS + [('key', 'TEXT')]
+            if name not in columns]
+    if len(columns) == 0 or len(missing) == 0: return
+
+    names = [name for name, sqltype in PARAMETERS]
+    with conn:
+        for name, sqltype in missing:
+            conn.execute('ALTER TABLE runs ADD COLUMN {} {}'.format(name, sqltype))
+        conn.execute('DROP INDEX IF EXISTS runs_key')
+        conn.execute('UPDATE runs SET key = NULL')
+        rows = conn.execute('SELECT id, {} FROM runs ORDER BY created'.format(
+                ', '.join(names))).fetchall()
+        latest = {}
+        for row in rows:
+            latest[key(dict(zip(names, row[1:])))] = row[0]
+        conn.executemany('UPDATE runs SET key = ? WHERE id = ?', latest.items())
+        conn.execute('DELETE FROM runs WHERE key IS NULL')
+
+
+# Database shared by the sweeps
+default_db = ResultsDB()
@@ -14,36 +14,109 @@ def re_124(m1, m2, m3, f1, f2, f3):
     return (re, 2)
 
 
-def re_arbitrary(m1, m2, m3, f1, f2, f3, p = 2, reltol = 1.0e-12):
-    error = 1.0
-    r21 = np.power(m1 / m2, 1. / 3.)
-    r32 = np.power(m2 / m3, 1. / 3.)
-
-    print("{:>4}, {:>18}, {:>18}, {:>18}, {:>18}, {:>18}, {:>18}".format(
-            "iter", "extr. value 1", "extr. value 2", "avg. extr. value",
-            "order 1", "order 2", "avg. order"))
-    for i in range(100):
-        fext1 = extrap(f1, f2, r21, p)
-        fext2 = extrap(f2, f3, r32, p)
-        fextavg = average(fext1, fext2)
-        p1 = order(f1, f2, fextavg, r21)
-        p2 = order(f2, f3, fextavg, r32)
-        if hasattr(p1, '__iter__'):
-            pavg = np.asarray([min(a1, a2) for a1, a2 in zip(p1, p2)])
-        else:
-            pavg = min(p1, p2)
-
-        if i == 0:
-            error1 = abs(pavg - p)
+def re_romberg(ms, fs, p = 2, dp = 2):
+    """Romberg-style Richardson extrapolation over any number of grids
+    
+    The error of the solution on each grid is assumed to be a series in
+    the grid spacing h ~ 1 / m with orders p, p + dp, p + 2 dp, ... With n
+    grids, the extrapolated solution and the first n - 1 terms of the series
+    are found from the n solutions, which is what the columns of a Romberg
+    table do for grids refined by a constant ratio. For three grids with
+    m = 1, 2, 4 and the default orders, the result is the same as re_124.
+    
+    Inputs:
+        ms = Refinement of each grid (e.g. number of sections), coarse to fine
+        fs = Solution on each grid (scalars or arrays of the same shape)
+        p = Order of the leading error term
+        dp = Increment between the orders of successive error terms
+    
+    Returns the extrapolated solution and the order p.
+    """
+    h = ms[0] / np.asarray(ms, dtype = float)
+    fs = np.asarray(fs, dtype = float)
+    orders = p + dp * np.arange(len(h) - 1)
+    A = np.column_stack([np.ones(len(h))] + [h**q for q in orders])
+    coefficients = np.linalg.solve(A, fs.reshape(len(h), -1))
+    return (coefficients[0].reshape(fs.shape[1:])[()], p)
 
-        error = abs(pavg - p) / error1
-        p = pavg
 
-#        print("{:>4}, {:>18}, {:>18}, {:>18}, {:>18}, {:>18}, {:>18}".format(
-#                i, fext1, fext2, fextavg, p1, p2, pavg))
-        if np.max(error) < reltol: break
+def re_arbitrary(m1, m2, m3, f1, f2, f3, p = 2, reltol = 1.0e-12, maxiter = 100):
+    """Richardson extrapolation with the observed order of convergence
+    
+    The observed order is the fixed point of the iteration
+    
+        p = min(order(f1, f2, fext, r21), order(f2, f3, fext, r32))
+    
+    where fext is the average of the values extrapolated from each pair of
+    grids with order p. At the fixed point both pairs of grids extrapolate
+    to the same value, so it is found as the root of the difference between
+    the two extrapolated values. The root is found for every element at
+    once: a vectorized scan brackets the sign change nearest to the initial
+    order, which is then refined by Newton steps that fall back to bisection
+    whenever they leave the bracket. Elements are frozen as soon
+    as they converge. Elements for which no observed order can be found
+    (e.g. oscillatory or already converged values) use the initial order.
+    
+    Inputs:
+        m1, m2, m3 = Refinement of the coarse, medium and fine grids (number
+                of cells)
+        f1, f2, f3 = Solutions on the three grids. Arrays of any (broadcast)
+                shape, e.g. (cases, stations), are extrapolated element-wise.
+        p = Initial (formal) order
+        reltol = Relative tolerance on the order
+        maxiter = Maximum number of Newton/bisection iterations
+    
+    Returns the extrapolated solution and the observed order.
+    """
+    r21 = np.power(m1 / m2, 1. / 3.)
+    r32 = np.power(m2 / m3, 1. / 3.)
+    f1, f2, f3 = np.broadcast_arrays(*[np.asarray(f, dtype = float) for f in (f1, f2, f3)])
+    
+    def residual(q):
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            return extrap(f1, f2, r21, q) - extrap(f2, f3, r32, q)
+    
+    # Bracket the sign change of the residual closest to the initial order
+    p0 = np.full(f1.shape, float(p))
+    grid = np.geomspace(1.0e-2, 2.0e1, 97).reshape((-1,) + (1,) * f1.ndim)
+    values = residual(grid)
+    change = (np.sign(values[:-1]) * np.sign(values[1:]) <= 0.0) & (
+            np.isfinite(values[:-1]) & np.isfinite(values[1:]))
+    distance = np.where(change, np.abs(np.log(grid[:-1] * grid[1:] / p0**2)), np.inf)
+    k = np.argmin(distance, axis = 0)
+    found = np.take_along_axis(change, k[None], axis = 0)[0]
+    lo = np.where(found, grid.ravel()[k], p0)
+    hi = np.where(found, grid.ravel()[k + 1], p0)
+    rlo = np.take_along_axis(values, k[None], axis = 0)[0]
+    
+    # Safeguarded Newton iterations on the bracketed elements
+    q = np.where(found, 0.5 * (lo + hi), p0)
+    active = found.copy()
+    for i in range(maxiter):
+        if not np.any(active): break
+        
+        rq = residual(q)
+        dq = 1.0e-7 * np.maximum(q, 1.0)
+        slope = (residual(q + dq) - rq) / dq
+        
+        # Keep the half of the bracket that contains the root
+        left = np.sign(rq) == np.sign(rlo)
+        lo = np.where(active & left, q, lo)
+        rlo = np.where(active & left, rq, rlo)
+        hi = np.where(active & ~left, q, hi)
         
-    return (fextavg, pavg)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            newton = q - rq / slope
+        inside = np.isfinite(newton) & (newton > lo) & (newton < hi)
+        step = np.where(inside, newton, 0.5 * (lo + hi))
+        
+        done = (np.abs(step - q) <= reltol * np.abs(q)) | (rq == 0.0)
+        q = np.where(active, step, q)
+        active &= ~done
+    
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        fextavg = average(extrap(f1, f2, r21, q), extrap(f2, f3, r32, q))
+    return (fextavg[()], q[()])
 
 
 def re2(m1, m2, m3, f1, f2, f3, p = 2, reltol = 1.0e-12):
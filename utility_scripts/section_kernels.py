@@ -0,0 +1,253 @@
+import numpy as np
+
+
+def valid(shape, npts = None, values = None):
+    """Get the mask of valid points in stacked section arrays
+
+    Sections may have different numbers of points. They are stored as rows
+    of 2-D arrays, where only the first npts points of each row are used (or,
+    if npts is None, the points that are not NaN).
+
+    Inputs:
+        shape = Shape of the stacked arrays (sections, points)
+        npts = Number of valid points in each section (None = use values)
+        values = Stacked array whose NaN entries mark missing points
+    """
+    if npts is not None:
+        return np.arange(shape[-1]) < np.asarray(npts)[..., None]
+    if values is not None:
+        return ~np.isnan(values)
+    return np.ones(shape, dtype = bool)
+
+
+def trapezoid(f, x, npts = None):
+    """Integrate stacked sections using the trapezoidal rule
+
+    Inputs:
+        f = Array of function values (..., points)
+        x = Array of the corresponding independent variable values
+        npts = Number of valid points in each section (None = all points
+                that are not NaN)
+
+    Returns an array of integrals with one value per section.
+    """
+    f = np.asarray(f, dtype = float)
+    x = np.asarray(x, dtype = float)
+    mask = valid(f.shape, npts, f + x)
+    segment = mask[..., 1:] & mask[..., :-1]
+    area = 0.5 * (f[..., 1:] + f[..., :-1]) * (x[..., 1:] - x[..., :-1])
+    return np.sum(np.where(segment, area, 0.0), axis = -1)
+
+
+def chord(x, npts = None):
+    """Calculate the chord length (x extent) of stacked sections
+
+    Inputs:
+        x = Array of chordwise coordinates (..., points)
+        npts = Number of valid points in each section (None = all points
+                that are not NaN)
+    """
+    x = np.asarray(x, dtype = float)
+    mask = valid(x.shape, npts, x)
+    return (np.max(np.where(mask, x, -np.inf), axis = -1) -
+            np.min(np.where(mask, x, np.inf), axis = -1))
+
+
+def interpolate(x1, x2, f1, f2, x):
+    """Interpolate linearly between (x1, f1) and (x2, f2) at x
+
+    All inputs are broadcast against each other.
+    """
+    x1, x2, f1, f2, x = [np.asarray(v, dtype = float) for v in (x1, x2, f1, f2, x)]
+    return (x - x1) / (x2 - x1) * (f2 - f1) + f1
+
+
+def midpoints(y, f, yc):
+    """Interpolate values given at section endpoints to the section midpoints
+
+    Inputs:
+        y = Spanwise coordinates of the section endpoints (n + 1)
+        f = Values at the section endpoints (n + 1)
+        yc = Spanwise coordinates of the section midpoints (n)
+    """
+    y = np.asarray(y, dtype = float)
+    f = np.asarray(f, dtype = float)
+    return interpolate(y[:-1], y[1:], f[:-1], f[1:], yc)
+
+
+def section_lift(dist):
+    r"""Calculate the chord-weighted section lift (c * cl) of each section
+
+    The pressure coefficient is integrated around each section,
+
+        c cl = \oint cp dx
+
+    taken in the direction of the points (trailing edge, upper surface,
+    leading edge, lower surface, trailing edge), so that lift is positive.
+
+    Inputs:
+        dist = Structured array of section distributions (see panair.read_agps)
+    """
+    return trapezoid(dist['cp'], dist['x'], dist['npts'])
+
+
+def _trapezoid_rule(f, x):
+    """Trapezoidal rule for rows of ascending points
+    """
+    return np.sum(0.5 * (f[:, 1:] + f[:, :-1]) * np.diff(x, axis = -1), axis = -1)
+
+
+def _simpson_rule(f, x):
+    """Composite Simpson's rule for rows of ascending, nonuniform points
+
+    Pairs of intervals are integrated with the quadratic through their three
+    points. If the number of intervals is odd, the last interval uses the
+    quadratic through the last three points.
+    """
+    n = x.shape[-1] - 1
+    if n < 2: return _trapezoid_rule(f, x)
+
+    h = np.diff(x, axis = -1)
+    m = 2 * (n // 2)
+    h0 = h[:, 0:m:2]
+    h1 = h[:, 1:m:2]
+    f0 = f[:, 0:m:2]
+    f1 = f[:, 1:m + 1:2]
+    f2 = f[:, 2:m + 1:2]
+    total = np.sum((h0 + h1) / 6.0 * ((2.0 - h1 / h0) * f0 +
+            (h0 + h1)**2 / (h0 * h1) * f1 + (2.0 - h0 / h1) * f2), axis = -1)
+
+    if n % 2 == 1:
+        h0 = h[:, -2]
+        h1 = h[:, -1]
+        total += ((2.0 * h1**2 + 3.0 * h0 * h1) / (6.0 * (h0 + h1)) * f[:, -1] +
+                (h1**2 + 3.0 * h0 * h1) / (6.0 * h0) * f[:, -2] -
+                h1**3 / (6.0 * h0 * (h0 + h1)) * f[:, -3])
+
+    return total
+
+
+def _clenshaw_curtis_rule(f, x):
+    """Interpolatory (Clenshaw-Curtis) rule for rows of ascending points
+
+    The weights integrate exactly the polynomial through all the points of
+    each row, expressed in Chebyshev polynomials. On cosine-spaced points
+    (x = (1 - cos(theta)) / 2 with uniform theta) these are the
+    Clenshaw-Curtis weights. On uniformly spaced points the interpolating
+    polynomial oscillates (Runge's phenomenon), so this rule is only suited to
+    cosine-clustered sections.
+    """
+    n = x.shape[-1]
+    a = x[:, :1]
+    b = x[:, -1:]
+    t = (2.0 * x - a - b) / (b - a)
+
+    k = np.arange(n)
+    moments = np.where(k % 2 == 0, 2.0 / (1.0 - k**2 + (k == 1)), 0.0)
+    V = np.polynomial.chebyshev.chebvander(t, n - 1)
+    w = np.linalg.solve(np.swapaxes(V, -1, -2), np.broadcast_to(moments, t.shape)[..., None])[..., 0]
+    return 0.5 * (b - a)[:, 0] * np.sum(w * f, axis = -1)
+
+
+def _spline_rule(f, x):
+    """Integral of the not-a-knot cubic spline through each row of points
+    """
+    from scipy.interpolate import CubicSpline
+    return np.array([CubicSpline(xi, fi).integrate(xi[0], xi[-1])
+            for xi, fi in zip(x, f)])
+
+
+# Quadrature rules for ascending points: (rule, order of accuracy)
+QUADRATURES = {
+    'trapezoid': (_trapezoid_rule, 2),
+    'simpson': (_simpson_rule, 4),
+    'clenshaw-curtis': (_clenshaw_curtis_rule, None),
+    'spline': (_spline_rule, 4),
+}
+
+
+def _integrate_surface(f, x, method):
+    """Integrate rows of ascending points, estimating the error
+
+    The error is estimated by repeating the integration on every other point
+    (keeping both end points): for a rule of order p, the error of the fine
+    result is about |Q_h - Q_2h| / (2^p - 1). Rules without a fixed order
+    (Clenshaw-Curtis) report |Q_h - Q_2h|, which is conservative.
+    """
+    rule, order = QUADRATURES[method]
+    value = rule(f, x)
+
+    m = x.shape[-1]
+    coarse = np.unique(np.concatenate([np.arange(0, m, 2), [m - 1]]))
+    if len(coarse) < 3 or len(coarse) == m:
+        return (value, np.full(value.shape, np.nan))
+    diff = np.abs(value - rule(f[:, coarse], x[:, coarse]))
+    if order is None: return (value, diff)
+    return (value, diff / (2.0**order - 1.0))
+
+
+def quadrature(f, x, npts = None, method = 'trapezoid'):
+    r"""Integrate stacked closed sections with a selectable quadrature rule
+
+    Each section runs from the trailing edge over the upper surface to the
+    leading edge and back along the lower surface, as in section_lift. It is
+    split at the leading edge (the point with the smallest x) into two
+    surfaces that are each integrated over ascending x,
+
+        \oint f dx = \int f_lower dx - \int f_upper dx
+
+    using one of QUADRATURES: 'trapezoid' (second order, identical to
+    trapezoid), 'simpson' (fourth order on nonuniform points),
+    'clenshaw-curtis' (interpolatory, spectrally accurate on cosine-spaced
+    points) or 'spline' (integral of a cubic spline). Repeated points (e.g.
+    the leading edge, which belongs to both the upper and the lower Panair
+    network) are only used once.
+
+    Inputs:
+        f = Array of function values (sections, points)
+        x = Array of the corresponding chordwise coordinates
+        npts = Number of valid points in each section (None = all points
+                that are not NaN)
+        method = Quadrature rule (see QUADRATURES)
+
+    Returns the integral and an estimate of its error for each section.
+    """
+    if method not in QUADRATURES:
+        raise ValueError("Unknown quadrature method '{}'".format(method))
+
+    f = np.atleast_2d(np.asarray(f, dtype = float))
+    x = np.atleast_2d(np.asarray(x, dtype = float))
+    mask = valid(x.shape, npts, f + x)
+    count = np.sum(mask, axis = -1)
+    le = np.argmin(np.where(mask, x, np.inf), axis = -1)
+
+    # Sections with the same number of points and leading-edge position are
+    # integrated together
+    value = np.zeros(len(x))
+    error = np.zeros(len(x))
+    groups = np.stack([count, le], axis = -1)
+    for n, l in np.unique(groups, axis = 0):
+        rows = np.nonzero((count == n) & (le == l))[0]
+        upper = (f[rows, l::-1], x[rows, l::-1])
+        lower = (f[rows, l:n], x[rows, l:n])
+        for (fs, xs), sign in ((upper, -1.0), (lower, 1.0)):
+            # Networks that share an edge repeat its points (e.g. the upper
+            # and lower Panair networks both contain the leading edge), so
+            # only the last of each run of repeated points is kept. This
+            # drops the zero-length intervals, which add nothing to the
+            # trapezoidal rule but break the higher-order rules.
+            keep = np.concatenate([np.diff(xs, axis = -1) != 0.0,
+                    np.ones((len(rows), 1), dtype = bool)], axis = -1)
+            for pattern in np.unique(keep, axis = 0):
+                sub = np.all(keep == pattern, axis = -1)
+                fk = fs[sub][:, pattern]
+                xk = xs[sub][:, pattern]
+                if xk.shape[-1] < 2: continue
+                if np.any(np.diff(xk, axis = -1) < 0.0):
+                    raise ValueError("Section surfaces must be ordered by x on each "
+                            "side of the leading edge")
+                v, e = _integrate_surface(fk, xk, method)
+                value[rows[sub]] += sign * v
+                error[rows[sub]] += e
+
+    return (value, error)
@@ -0,0 +1,77 @@
+import numpy as np
+import os
+import tempfile
+
+
+def load(filename, parse, suffix = '.npy', save = True):
+    """Read parsed results from a binary sidecar file, parsing them if needed
+
+    The result of parse(filename) is saved next to the file (filename +
+    suffix) as two consecutive uncompressed .npy arrays: a stamp with the
+    size and modification time of the file, followed by the data. Later
+    calls memory-map the data from the sidecar (read-only) while the stamp
+    still matches, instead of parsing the text file again.
+
+    Inputs:
+        filename = Name of the result file
+        parse = Function that reads the file given as its only argument and
+                returns a NumPy array (plain or structured, without objects)
+        suffix = Suffix of the sidecar file. Callers that parse the same file
+                in different ways must use different suffixes.
+        save = Save the sidecar file? (True/False)
+    """
+    sidecar = filename + suffix
+    stat = os.stat(filename)
+    stamp = np.array([stat.st_size, stat.st_mtime_ns], dtype = np.int64)
+    if os.path.isfile(sidecar):
+        try:
+            data = _map(sidecar, stamp)
+            if data is not None:
+                return data
+        except (OSError, ValueError):
+            pass  # Unreadable sidecar, parse the file again
+
+    data = parse(filename)
+
+    if save:
+        # Write the sidecar file in one step, so that concurrent readers never
+        # see a partial file. A read-only result directory is not an error.
+        try:
+            fd, tmp = tempfile.mkstemp(dir = os.path.dirname(os.path.abspath(sidecar)))
+        except OSError:
+            return data
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, stamp)
+                np.save(f, data, allow_pickle = False)
+            os.replace(tmp, sidecar)
+        except (OSError, ValueError):
+            if os.path.isfile(tmp): os.remove(tmp)
+
+    return data
+
+
+def _map(sidecar, stamp):
+    """Memory-map the data of a sidecar file (see load)
+
+    Returns None if the stamp of the sidecar file does not match.
+    """
+    with open(sidecar, 'rb') as f:
+        if not np.array_equal(np.load(f), stamp):
+            return None
+
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    if dtype.hasobject:
+        raise ValueError("Object arrays cannot be memory-mapped")
+    if int(np.prod(shape)) == 0:
+        return np.empty(shape, dtype = dtype)  # Empty files cannot be mapped
+
+    return np.memmap(sidecar, dtype = dtype, mode = 'r', shape = shape,
+            order = 'F' if fortran else 'C', offset = offset)
@@ -0,0 +1,280 @@
+import numpy as np
+
+from phd_scripts.utility_scripts import executor
+
+
+def matern52(X1, X2, length_scales):
+    """Matern 5/2 correlation between two sets of points
+
+    Inputs:
+        X1 = Points, shape (n1, dimensions)
+        X2 = Points, shape (n2, dimensions)
+        length_scales = Correlation length in each dimension
+    """
+    d = (X1[:, None, :] - X2[None, :, :]) / length_scales
+    r = np.sqrt(5.0 * np.sum(d**2, axis = -1))
+    return (1.0 + r + r**2 / 3.0) * np.exp(-r)
+
+
+class GaussianProcess(object):
+    """Gaussian-process regression with a Matern 5/2 kernel
+
+    The inputs are scaled to the unit box given by bounds. The length scale
+    of each dimension is found by maximizing the likelihood of the data, with
+    the signal variance and constant mean found in closed form.
+    """
+    def __init__(self, bounds, nugget = 1.0e-10):
+        """Constructor
+
+        Inputs
+        ------
+        bounds:     Lower and upper bound of each input, shape (dimensions, 2)
+        nugget:     Relative variance added to the diagonal of the
+                    correlation matrix for numerical stability
+        """
+        self.bounds = np.asarray(bounds, dtype = float)
+        self.nugget = nugget
+        self.length_scales = np.full(len(self.bounds), 0.5)
+
+
+    def scale(self, X):
+        """Scale points to the unit box
+        """
+        low = self.bounds[:, 0]
+        high = self.bounds[:, 1]
+        return (np.asarray(X, dtype = float) - low) / np.where(high > low, high - low, 1.0)
+
+
+    def _factor(self, log_length_scales):
+        """Factor the correlation matrix and find the mean and variance
+        """
+        R = matern52(self.X, self.X, np.exp(log_length_scales))
+        R[np.diag_indices_from(R)] += self.nugget
+        L = np.linalg.cholesky(R)
+        ones = np.linalg.solve(L, np.ones(len(self.X)))
+        z = np.linalg.solve(L, self.y)
+        mean = (ones @ z) / (ones @ ones)
+        alpha = z - mean * ones
+        variance = max(alpha @ alpha / len(self.X), 1.0e-300)
+        return (L, mean, alpha, variance)
+
+
+    def _negative_log_likelihood(self, log_length_scales):
+        try:
+            L, mean, alpha, variance = self._factor(log_length_scales)
+        except np.linalg.LinAlgError:
+            return np.inf
+        return 0.5 * len(self.X) * np.log(variance) + np.sum(np.log(np.diag(L)))
+
+
+    def fit(self, X, y, optimize = True):
+        """Fit the process to data
+
+        Inputs:
+            X = Points, shape (n, dimensions)
+            y = Values at the points (n)
+            optimize = Optimize the length scales? (True/False)
+        """
+        from scipy.optimize import minimize
+
+        self.X = self.scale(X)
+        self.y = np.asarray(y, dtype = float)
+
+        if optimize:
+            # Multiple starts, since the likelihood may have several maxima
+            best = None
+            for start in (-1.5, -0.5, 0.5):
+                x0 = np.full(self.X.shape[1], start)
+                result = minimize(self._negative_log_likelihood, x0, method = 'L-BFGS-B',
+                        bounds = [(-4.0, 3.0)] * len(x0))
+                if best is None or result.fun < best.fun: best = result
+            self.length_scales = np.exp(best.x)
+
+        self._L, self._mean, alpha, self._variance = self._factor(np.log(self.length_scales))
+        self._weights = np.linalg.solve(self._L.T, alpha)
+        return self
+
+
+    def predict(self, X):
+        """Predict the mean and standard deviation at points
+
+        Inputs:
+            X = Points, shape (n, dimensions)
+        """
+        Xs = self.scale(np.atleast_2d(X))
+        r = matern52(Xs, self.X, self.length_scales)
+        mean = self._mean + r @ self._weights
+        v = np.linalg.solve(self._L, r.T)
+        variance = self._variance * np.maximum(1.0 + self.nugget - np.sum(v**2, axis = 0), 0.0)
+        return (mean, np.sqrt(variance))
+
+
+class Surrogate(object):
+    """Adaptive surrogate of an expensive function of wing parameters
+
+    The function (e.g. panair_wing_cla.cla) is evaluated at a few points and
+    a GaussianProcess is fitted to the results, optionally on top of a cheap
+    prior (e.g. a wing_cla correlation). New evaluations are placed where the
+    predicted standard deviation is largest, until it is below a tolerance
+    everywhere in the parameter box. The surrogate then serves dense curves.
+
+    For example,
+
+        s = Surrogate(panair_wing_cla.cla, {'RA': (1.0, 8.0)}, {'c': 1.0},
+                prior = lambda RA, c: wing_cla.a_hodson(RA))
+        s.learn(tol = 0.005)
+        cla = s(RA = np.linspace(1.0, 8.0, 200))
+    """
+    def __init__(self, function, bounds, fixed = None, prior = None, log = ('RA',)):
+        """Constructor
+
+        Inputs
+        ------
+        function:   Function to model, called with the parameters as keywords
+        bounds:     Dictionary mapping the varied parameters to (low, high)
+        fixed:      Dictionary of parameters passed to function unchanged
+        prior:      Cheap approximation of function, called with the same
+                    keywords and arrays of values (None = constant)
+        log:        Parameters whose logarithm is used as the coordinate
+        """
+        self.function = function
+        self.names = list(bounds)
+        self.fixed = dict(fixed) if fixed is not None else {}
+        self.prior = prior
+        self.log = set(log)
+        self.bounds = np.array([self._coordinate(name, bounds[name]) for name in self.names])
+        self.process = GaussianProcess(self.bounds)
+
+        self.points = np.zeros((0, len(self.names)))  # Evaluated points
+        self.values = np.zeros(0)  # Function values at the points
+
+
+    def _coordinate(self, name, value):
+        value = np.asarray(value, dtype = float)
+        return np.log(value) if name in self.log else value
+
+
+    def _parameters(self, points):
+        """Convert points (coordinates) to a dictionary of parameter arrays
+        """
+        params = {name: np.exp(points[:, i]) if name in self.log else points[:, i]
+                for i, name in enumerate(self.names)}
+        params.update(self.fixed)
+        return params
+
+
+    def _prior(self, points):
+        if self.prior is None: return np.zeros(len(points))
+        return np.broadcast_to(self.prior(**self._parameters(points)), len(points))
+
+
+    def evaluate(self, points, max_workers = None):
+        """Evaluate the function at points and refit the surrogate
+
+        The evaluations are run concurrently (see executor.starmap).
+
+        Inputs:
+            points = Points (coordinates), shape (n, parameters)
+            max_workers = Maximum number of concurrent evaluations
+        """
+        points = np.atleast_2d(points)
+        params = self._parameters(points)
+
+        # Only the varied parameters are converted; the fixed ones (e.g.
+        # deck = 'python' or quadrature = 'simpson') are passed unchanged
+        args = [dict(self.fixed, **{name: float(params[name][i]) for name in self.names})
+                for i in range(len(points))]
+        values = executor.starmap(_call, [(self.function, a) for a in args], max_workers)
+
+        self.points = np.concatenate([self.points, points])
+        self.values = np.concatenate([self.values, np.asarray(values, dtype = float)])
+        self.process.fit(self.points, self.values - self._prior(self.points))
+
+
+    def candidates(self, n = 1024, seed = 0):
+        """Generate candidate points filling the parameter box
+        """
+        rng = np.random.default_rng(seed)
+        u = (np.arange(n)[:, None] + rng.uniform(size = (n, len(self.names)))) / n
+        for j in range(u.shape[1]): u[:, j] = rng.permutation(u[:, j])  # Latin hypercube
+        return self.bounds[:, 0] + u * (self.bounds[:, 1] - self.bounds[:, 0])
+
+
+    def next_points(self, n = 1, candidates = None):
+        """Choose the next points to evaluate, where the uncertainty is largest
+
+        Several points are chosen one at a time, each time treating the
+        previous choices as evaluated (the standard deviation of a Gaussian
+        process does not depend on the values).
+
+        Inputs:
+            n = Number of points
+            candidates = Candidate points (None = see candidates)
+        """
+        if candidates is None: candidates = self.candidates()
+        gp = GaussianProcess(self.bounds, self.process.nugget)
+        gp.length_scales = self.process.length_scales
+        points = self.process.X * (self.bounds[:, 1] - self.bounds[:, 0]) + self.bounds[:, 0]
+        chosen = []
+        for i in range(n):
+            std = self.process.predict(candidates)[1] if i == 0 else gp.predict(candidates)[1]
+            chosen.append(candidates[np.argmax(std)])
+            gp.fit(np.concatenate([points, chosen]), np.zeros(len(points) + len(chosen)),
+                    optimize = False)
+
+        return np.array(chosen)
+
+
+    def learn(self, tol = 1.0e-3, initial = None, max_evals = 20, batch = 1,
+            max_workers = None):
+        """Evaluate the function until the surrogate meets a tolerance
+
+        Inputs:
+            tol = Largest acceptable predicted standard deviation
+            initial = Number of initial points (None = 2 per parameter + 1),
+                    placed at the corners and centre of the box for one
+                    parameter and on a Latin hypercube otherwise
+            max_evals = Maximum number of function evaluations
+            batch = Number of points evaluated concurrently in each step
+            max_workers = Maximum number of concurrent evaluations
+
+        Returns the largest predicted standard deviation.
+        """
+        if len(self.points) == 0:
+            if initial is None: initial = 2 * len(self.names) + 1
+            if len(self.names) == 1:
+                start = np.linspace(self.bounds[0, 0], self.bounds[0, 1], initial)[:, None]
+            else:
+                start = self.candidates(initial, seed = 1)
+            self.evaluate(start, max_workers)
+
+        candidates = self.candidates()
+        while True:
+            std = np.max(self.process.predict(candidates)[1])
+            if std <= tol or len(self.points) >= max_evals: return std
+            n = min(batch, max_evals - len(self.points))
+            self.evaluate(self.next_points(n, candidates), max_workers)
+
+
+    def __call__(self, return_std = False, **params):
+        """Evaluate the surrogate
+
+        Inputs:
+            params = Values (or arrays) of the varied parameters
+            return_std = Also return the predicted standard deviation?
+
+        Returns the predicted values with the broadcast shape of the inputs.
+        """
+        values = np.broadcast_arrays(*[self._coordinate(name, params[name])
+                for name in self.names])
+        points = np.stack([v.ravel() for v in values], axis = -1)
+        mean, std = self.process.predict(points)
+        mean = (mean + self._prior(points)).reshape(values[0].shape)
+        if return_std: return (mean, std.reshape(values[0].shape))
+        return mean
+
+
+def _call(function, params):
+    """Call a function with keyword arguments (used with executor.starmap)
+    """
+    return function(**params)
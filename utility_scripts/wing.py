@@ -161,6 +161,58 @@ class Wing(object):
         """
         return (self.c_integral(self.y[1:]) - self.c_integral(self.y[:-1]))
 
+
+    @property
+    def span_coordinates(self):
+        """Get the signed spanwise coordinates of the section endpoints
+        
+        The coordinates increase monotonically along the sections. For full
+        wings, the left semispan has negative coordinates.
+        """
+        if self.symm: return self.y
+        return np.concatenate([-self.y[:self.nSec + 1], self.y[self.nSec + 1:]])
+        
+        
+    def restriction(self, coarse):
+        """Build the operator that averages section values onto a coarser wing
+        
+        Each section of the coarse wing receives the area-weighted average of
+        the values of the sections of this wing that overlap it. If the
+        sections are nested (e.g. both wings use the same clustering and the
+        number of sections of this wing is a multiple of that of the coarse
+        wing), every section contributes its full area to one coarse section.
+        Otherwise the area of a section is split where it straddles a coarse
+        section boundary.
+        
+        Inputs
+        ------
+        coarse:     Wing with the same planform and span and fewer sections
+        
+        Returns a scipy.sparse CSR matrix R with one row per coarse section and
+        one column per section of this wing, so that R @ f coarsens the
+        section values f in a single sparse matrix-vector product.
+        """
+        from scipy import sparse
+        
+        fine = self.span_coordinates
+        crs = coarse.span_coordinates
+        
+        # Pieces between the endpoints of both wings; endpoints that agree to
+        # round-off are merged so that nested grids produce no slivers
+        breaks = np.union1d(fine, crs)
+        keep = np.concatenate([[True], np.diff(breaks) > 1.0e-12 * self.b])
+        breaks = breaks[keep]
+        mid = 0.5 * (breaks[:-1] + breaks[1:])
+        rows = np.clip(np.searchsorted(crs, mid) - 1, 0, len(crs) - 2)
+        cols = np.clip(np.searchsorted(fine, mid) - 1, 0, len(fine) - 2)
+        area = np.abs(self.c_integral(np.abs(breaks[1:])) -
+                self.c_integral(np.abs(breaks[:-1])))
+        
+        R = sparse.csr_matrix((area, (rows, cols)),
+                shape = (len(crs) - 1, len(fine) - 1))
+        total = np.asarray(R.sum(axis = 1)).ravel()
+        return sparse.csr_matrix(sparse.diags(1.0 / total) @ R)
+
         
 class Rectangular(Wing):
     """Defines the planform geometry of a rectangular wing
@@ -251,9 +303,12 @@ class Tapered(Wing):
         
     def c_integral(self, y):
         """Calculate the indefinite integral of the chord at this y-coordinate
+
+        The chord varies linearly as c_root * (1 - (1 - RT) * 2y/b), so the
+        integral is c_root * (y - (1 - RT) * y**2/b) for 0 <= y <= b/2.
         """
         return (2.0 * self.b  / (self.RA * (1.0 + self.RT)) *
-                (y - (1.0 - self.RT) * 2.0 * y**2 / self.b))
+                (y - (1.0 - self.RT) * y**2 / self.b))
 
 
     @property
@@ -9,7 +9,10 @@ def resistance_parallel(r1, r2):
         r1 = Value of resistor 1
         r2 = Value of resistor 2
     """
-    return ((r1)**(-1) + (r2)**(-1))**(-1)
+    r1 = np.asarray(r1, dtype = float)
+    r2 = np.asarray(r2, dtype = float)
+    with np.errstate(divide = 'ignore'):
+        return (((r1)**(-1) + (r2)**(-1))**(-1))[()]
 
 
 def a_classical(A, a0 = 2.0 * np.pi):
@@ -27,6 +30,9 @@ def a_classical(A, a0 = 2.0 * np.pi):
         A = Aspect ratio of wing (b^2 / Sw)
         a0 = 2D section wing lift slope (2*pi for thin airfoils)
     """
+    A = np.asarray(A, dtype = float)
+    a0 = np.asarray(a0, dtype = float)
+
     # Calculate the individual resistance values
     r1 = a0
     r2 = np.pi * A
@@ -50,6 +56,8 @@ def a_slender(A):
     Inputs:
         A = Aspect ratio of wing (b^2 / Sw)
     """
+    A = np.asarray(A, dtype = float)
+
     # Calculate the individual resistance values
     r1 = np.inf
     r2 = np.pi * A / 2.0
@@ -73,6 +81,9 @@ def a_helmbold(A, a0 = 2.0 * np.pi):
         A = Aspect ratio of wing (b^2 / Sw)
         a0 = 2D section wing lift slope (2*pi for thin airfoils)
     """
+    A = np.asarray(A, dtype = float)
+    a0 = np.asarray(a0, dtype = float)
+
     # Calculate the individual resistance values
     r1 = np.sqrt(a0**(-2) + (np.pi * A)**(-2))**(-1)
     r2 = np.pi * A
@@ -95,6 +106,9 @@ def a_jones(A, a0 = 2.0 * np.pi):
         A = Aspect ratio of wing (b^2 / Sw)
         a0 = 2D section wing lift slope (2*pi for thin airfoils)
     """
+    A = np.asarray(A, dtype = float)
+    a0 = np.asarray(a0, dtype = float)
+
     # Calculate the eccentricity of the ellipse
     k = 1 / (np.pi * A / 4.0)
     
@@ -128,6 +142,9 @@ def a_vandyke(A, a0 = 2.0 * np.pi):
         A = Aspect ratio of wing (b^2 / Sw)
         a0 = 2D section wing lift slope (2*pi for thin airfoils)
     """
+    A = np.asarray(A, dtype = float)
+    a0 = np.asarray(a0, dtype = float)
+
     # Calculate the individual resistance values
     r1 = a0
     r2 = (np.pi * A) / (1 + 4.0 * a0 / (np.pi**3 * A) *
@@ -153,6 +170,9 @@ def a_germain(A, a0 = 2.0 * np.pi):
         A = Aspect ratio of wing (b^2 / Sw)
         a0 = 2D section wing lift slope (2*pi for thin airfoils)
     """
+    A = np.asarray(A, dtype = float)
+    a0 = np.asarray(a0, dtype = float)
+
     # Calculate the individual resistance values
     r1 = a0
     r2 = (np.pi * A) / (1.0 + (4 * a0) / (np.pi**3 * A) *
@@ -182,35 +202,28 @@ def a_hauptmanmiloh(A):
     Inputs:
         A = Aspect ratio of wing (b^2 / Sw)
     """
-    if A < (4.0 / np.pi):
-        # Slender wing
-        # Calculate the eccentricity and parameter for the ellipse
-        k = (np.pi * A) / 4.0
+    A = np.asarray(A, dtype = float)
+    slender = A < (4.0 / np.pi)
+    circular = A == (4.0 / np.pi)
+    
+    # Calculate the eccentricity and parameter for the ellipse, with k the
+    # ratio of the minor to the major axis (pi A / 4 for slender wings and
+    # 4 / (pi A) for high-aspect-ratio wings)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        k = np.where(slender, (np.pi * A) / 4.0, 4.0 / (np.pi * A))
         h = np.sqrt(1.0 - k**2)
         
         # Calculate the perimeter of the ellipse using the complete elliptic
         # integral of the second kind
         E = ellipe(h**2)
         
-        # Calculate the resistance value r1
-        r1 = (np.pi * A + (4.0 * k**3 / h * np.log((1.0 + h) / k))) / E**2
+        # Calculate the resistance value r1 of each branch
+        r1 = np.where(slender,
+                (np.pi * A + (4.0 * k**3 / h * np.log((1.0 + h) / k))) / E**2,
+                4 * (k + np.arcsin(h) / h) / E**2)
     
-    elif A > (4.0 / np.pi):
-        # High-aspect-ratio wing
-        # Calculate the eccentricity and parameter for the ellipse
-        k = 4.0 / (np.pi * A)
-        h = np.sqrt(1.0 - k**2)
-        
-        # Calculate the perimeter of the ellipse using the complete elliptic
-        # integral of the second kind
-        E = ellipe(h**2)
-        
-        # Calculate the resistance value r1
-        r1 = 4 * (k + np.arcsin(h) / h) / E**2
-        
-    else:
-        # Circular wing
-        r1 = 32.0 / (2.0 + np.pi**2)
+    # Circular wing (both branches are singular at h = 0)
+    r1 = np.where(circular, 32.0 / (2.0 + np.pi**2), r1)
     
     # Calculate the resistance value r2
     r2 = np.pi * A
@@ -239,6 +252,9 @@ def a_kuchemann(A, a0 = 2.0 * np.pi):
         A = Aspect ratio of wing (b^2 / Sw)
         a0 = 2D section wing lift slope (2*pi for thin airfoils)
     """
+    A = np.asarray(A, dtype = float)
+    a0 = np.asarray(a0, dtype = float)
+
     # Calculate Kuchemann's n parameter
     n = 1.0 - 0.5 * (1.0 + (a0 / (np.pi * A))**2)**(-0.25)
     
@@ -251,12 +267,16 @@ def a_kuchemann(A, a0 = 2.0 * np.pi):
 
 
 def a_modified_slender(A, a0 = 2.0 * np.pi):
+    A = np.asarray(A, dtype = float)
+    a0 = np.asarray(a0, dtype = float)
     r1 = a0
     r2 = np.pi * A / 2.0
     return resistance_parallel(r1, r2)
     
     
 def a_hodson(A, a0 = 2.0 * np.pi):
+    A = np.asarray(A, dtype = float)
+    a0 = np.asarray(a0, dtype = float)
     r1 = a0
     r2 = A * (np.pi - np.arctan(2.0 * a0 / (np.pi * A)))
     return resistance_parallel(r1, r2)
@@ -295,14 +315,9 @@ def a_medan():
 
 
 def A_to_h2(Arange):
-    h2range = []
-    for A in Arange:
-        if A < 4 / np.pi:
-            h2range.append(-(1 - ((np.pi * A) / 4)**2))
-        else:
-            h2range.append( (1 - (4 / (np.pi * A))**2))
-
-    return np.asarray(h2range)
+    Arange = np.asarray(Arange, dtype = float)
+    return np.where(Arange < 4 / np.pi, -(1 - ((np.pi * Arange) / 4)**2),
+            (1 - (4 / (np.pi * Arange))**2))
 
 
     